@@ -1,11 +1,21 @@
+from contextlib import nullcontext
 from colorama import Fore, Style
 import pandas as pd
 import sqlalchemy as sa
+import time
 import os
 
-from .helper import range_dt, time_add_time, calc_incs, path_inc
+from .helper import range_dt, time_add_time, calc_incs, path_inc, write_model_csv
 from .database import get_db_engine
 from .SubsetClass import SubsetClass
+from .spill import SpillStore
+from .tuning import ChunkTuner
+from .fetchers import get_fetcher
+from .summary import has_summary, read_high_water_mark, read_summary
+from .config import spill_memory_budget, spill_dir, csv_chunk_rows, csv_chunk_columns, csv_workers
+from .config import chunk_size as default_chunk_size, chunk_autotune, chunk_min_size, chunk_max_size
+from .config import chunk_max_latency, chunk_max_bytes, chunk_state_file, fetcher as default_fetcher
+from .config import use_summary as default_use_summary
 
 
 # default SQL driver (Windows)
@@ -24,7 +34,8 @@ class ModelClass(object):
     """
     Class that stores details of a model to be created
     """
-    def __init__(self, date_time, time_span, table, column_index, column_name):
+    def __init__(self, date_time, time_span, table, column_index, column_name, engine=None, fetcher=None,
+                 use_summary=None):
         """
         Constructor for ModelClass
 
@@ -33,6 +44,9 @@ class ModelClass(object):
         :param str table: Name of table in database
         :param str column_index: Name of column to use as an index '_TIMESTAMP'
         :param str column_name: Column name of tags in database
+        :param engine: SQLAlchemy engine to query (None uses engine from config.py)
+        :param Fetcher fetcher: Fetcher reading pages of query (None uses fetcher from config.py)
+        :param bool use_summary: Read fully covered timesteps from summary table (None uses config.py)
         """
 
         self.date_time = date_time
@@ -40,11 +54,18 @@ class ModelClass(object):
         self.table = table
         self.column_index = column_index
         self.column_name = column_name
+        self.engine = engine if engine is not None else get_db_engine()
+        self.fetcher = fetcher if fetcher is not None else get_fetcher(default_fetcher)
+        self.use_summary = use_summary if use_summary is not None else default_use_summary
+        self.summary_df = None
         self.model_df = None
         self.query_df = None
         self.model_output_file = ''
         self.query_output_file = ''
         self.subset_list = []
+        self.spill_store = None
+        self.flag_tags = set()
+        self.float_tags = set()
 
         metadata = sa.MetaData()
 
@@ -60,6 +81,9 @@ class ModelClass(object):
         # create datetime string
         self._start, self._end = range_dt(self.date_time, minimum=-self.time_span, maximum=0)
 
+        # start of raw rows to query, moved forward when timesteps are read from summary
+        self.query_start = self._start
+
         # calculate increments
         _incs = calc_incs(self.time_span)
 
@@ -75,13 +99,71 @@ class ModelClass(object):
         Initialize model dataframe to store calculations per tag and timestep
         """
 
-        self.model_df = pd.DataFrame(columns=self.query_df[self.column_name].unique())
+        if self.spill_store is not None:
+            tags = self.spill_store.get_tags()
+        else:
+            tags = self.query_df[self.column_name].unique()
+
+        if self.summary_df is not None:
+            tags = list(dict.fromkeys(list(self.summary_df['_NAME'].unique()) + list(tags)))
+
+        # numeric model with row index set to _TIMESTAMP
+        self.model_df = pd.DataFrame(index=pd.Index(self.min_increments, name=self.column_index),
+                                     columns=tags,
+                                     dtype='float64')
+
+    def build(self, backend, fetch=True, fetch_slot=None, write_model=True, workers=None):
+        """
+        Query database, aggregate and write csv files of model, removing its output files if the build fails
+
+        :param AggregationBackend backend: Backend used for aggregation
+        :param bool fetch: Query database (False if query dataframe was set with set_query_df)
+        :param fetch_slot: Context manager held while querying database, e.g. semaphore of connections (None for none)
+        :param bool write_model: Write csv of model (False if model dataframe is only used in memory)
+        :param int workers: Number of processes formatting csv of model (None uses csv_workers of config.py)
+        """
+
+        try:
+            if fetch:
+                with fetch_slot if fetch_slot is not None else nullcontext():
+                    self.create_query_df()
+
+            self.init_model_df()
+
+            # display output for file save
+            print(
+                f'{Fore.LIGHTGREEN_EX}'
+                f'\nSQL Query Saved: {Fore.YELLOW}{self.get_query_output()}'
+                f'{Style.RESET_ALL}')
+
+            self.create_query_csv()
+
+            # display output for size of dataframe
+            print(
+                f'{Fore.LIGHTGREEN_EX}'
+                f'\tBase Dataframe Created with {Fore.YELLOW}{len(self.get_model_df().columns)} '
+                f'{Fore.LIGHTGREEN_EX}columns.{Fore.LIGHTGREEN_EX}'
+                f'{Style.RESET_ALL}')
+
+            self.build_model_df(backend)
 
-        # add _TIMESTAMP column to dataframe
-        self.model_df[self.column_index] = self.min_increments
+            if write_model:
+                # display output for file save
+                print(
+                    f'{Fore.LIGHTGREEN_EX}'
+                    f'\nOutput Model Saved: {Fore.YELLOW}{self.get_model_output()}'
+                    f'{Style.RESET_ALL}')
 
-        # set row index to _TIMESTAMP
-        self.model_df.set_index(self.column_index, inplace=True)
+                self.create_model_csv(workers=workers)
+        except Exception:
+            # remove (claimed, empty or partly written) output files
+            for output_file in (self.model_output_file, self.query_output_file):
+                if output_file and os.path.exists(output_file):
+                    os.remove(output_file)
+            raise
+        finally:
+            # remove temporary files of spill mode
+            self.cleanup_spill()
 
     def create_query_df(self):
         """
@@ -98,27 +180,198 @@ class ModelClass(object):
             f'{Fore.LIGHTGREEN_EX}{self.time_span} hours'
             f'{Style.RESET_ALL}')
 
-        engine = get_db_engine()
+        self.load_summary()
+
         offset = 0
-        chunk_size = 100000
+        tuner = None
+        chunk_size = default_chunk_size
+
+        if chunk_autotune:
+            tuner = ChunkTuner(self.table,
+                               state_file=chunk_state_file or os.path.join(os.path.expanduser('~'), 'modeling',
+                                                                           'chunk_sizes.json'),
+                               initial=default_chunk_size,
+                               minimum=chunk_min_size,
+                               maximum=chunk_max_size,
+                               max_latency=chunk_max_latency,
+                               max_chunk_bytes=chunk_max_bytes)
+            chunk_size = tuner.get_chunk_size()
 
         dfs = []
-        while True:
-            sa_select = sa.select(
-                [self.data_table],
-                whereclause=sa.and_(
-                    self.data_table.c._TIMESTAMP > '{}'.format(self._start),
-                    self.data_table.c._TIMESTAMP <= '{}'.format(self._end)),
-                limit=chunk_size,
-                offset=offset,
-                order_by=self.data_table.c._NUMERICID
-            )
-            dfs.append(pd.read_sql(sa_select, engine))
-            offset += chunk_size
-            if len(dfs[-1]) < chunk_size:
-                break
-
-        self.query_df = pd.concat(dfs)
+        dfs_bytes = 0
+
+        # one connection for all pages of this query
+        connection = self.fetcher.connect(self)
+        try:
+            while True:
+                fetch_start = time.time()
+                df = self.fetcher.read_page(self, offset, chunk_size, connection)
+                fetch_time = time.time() - fetch_start
+                df_bytes = df.memory_usage(deep=True).sum()
+                dfs.append(df)
+                dfs_bytes += df_bytes
+                offset += chunk_size
+
+                # spill buffered chunks to disk once memory budget is exceeded
+                if spill_memory_budget is not None and dfs_bytes > spill_memory_budget:
+                    self.spill_dfs(dfs)
+                    dfs = []
+                    dfs_bytes = 0
+
+                if len(df) < chunk_size:
+                    break
+
+                # adjust size of next chunk from measurements of this full chunk
+                if tuner is not None:
+                    chunk_size = tuner.record(len(df), fetch_time, df_bytes)
+        finally:
+            self.fetcher.close(connection)
+
+        if tuner is not None:
+            tuner.save()
+
+        if self.spill_store is not None:
+            self.spill_dfs(dfs)
+            self.query_df = None
+        else:
+            self.query_df = pd.concat(dfs)
+
+    def load_summary(self):
+        """
+        Read timesteps fully covered by summary table, raw rows are then only queried after them
+        """
+
+        first_step = pd.Timestamp(self.min_increments[0])
+
+        # summary buckets are aligned to 10 minutes and summarize _NAME
+        if not self.use_summary or self.column_name != '_NAME' or first_step != first_step.floor('10min'):
+            return
+
+        if not has_summary(self.engine, self.table):
+            return
+
+        hwm_id, hwm_ts = read_high_water_mark(self.engine, self.table)
+        if hwm_ts is None:
+            return
+
+        # rows added after the last refresh may be late (older timestamps), their timesteps are queried raw
+        limit = hwm_ts
+        first_late = self.get_first_unsummarized(hwm_id)
+        if first_late is not None and first_late < limit:
+            limit = first_late
+
+        covered = [ts for ts in self.min_increments if ts < limit]
+
+        if not covered:
+            return
+
+        self.summary_df = read_summary(self.engine, self.table, covered[0], covered[-1])
+        self.query_start = covered[-1]
+
+        print(
+            f'{Fore.GREEN}\nRead {Fore.LIGHTGREEN_EX}{len(covered)}{Fore.GREEN} of '
+            f'{Fore.LIGHTGREEN_EX}{len(self.min_increments)}{Fore.GREEN} timesteps from summary, querying rows after '
+            f'{Fore.LIGHTGREEN_EX}{str(self.query_start)}'
+            f'{Style.RESET_ALL}')
+
+    def spill_dfs(self, dfs):
+        """
+        Spill chunks of query dataframe to temporary files partitioned by timestep
+
+        :param list dfs: Chunks of query dataframe
+        """
+
+        if self.spill_store is None:
+            self.spill_store = SpillStore(base=self.min_increments[0],
+                                          column_index=self.column_index,
+                                          column_name=self.column_name,
+                                          table=self.data_table,
+                                          path=spill_dir)
+
+        for df in dfs:
+            self.spill_store.append(df)
+
+    def cleanup_spill(self):
+        """
+        Remove temporary files of spilled query chunks
+        """
+
+        if self.spill_store is not None:
+            self.spill_store.cleanup()
+            self.spill_store = None
+
+    def get_query_select(self, offset, chunk_size):
+        """
+        Get select of one page of rows within calculated timeframe
+
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+
+        :return: SQLAlchemy select
+        """
+
+        return sa.select(
+            [self.data_table],
+            whereclause=self.window_clause(),
+            limit=chunk_size,
+            offset=offset,
+            order_by=self.data_table.c._NUMERICID
+        )
+
+    def window_clause(self):
+        """
+        Get where clause selecting rows within calculated timeframe
+
+        :return: SQLAlchemy where clause
+        """
+
+        return sa.and_(
+            self.data_table.c._TIMESTAMP > self.query_start,
+            self.data_table.c._TIMESTAMP <= self._end)
+
+    def get_first_unsummarized(self, hwm_id):
+        """
+        Get earliest timestamp within timeframe of rows not yet in summary (computed on server)
+
+        :param int hwm_id: Last summarized id
+
+        :return: Earliest timestamp of rows above high-water mark (None if there are none)
+        :rtype: datetime
+        """
+
+        sa_select = sa.select(
+            [sa.func.min(self.data_table.c._TIMESTAMP)],
+            whereclause=sa.and_(self.data_table.c.id > hwm_id,
+                                self.data_table.c._TIMESTAMP > self._start))
+
+        conn_c = self.engine.connect()
+        try:
+            first_late = conn_c.execute(sa_select).scalar()
+        finally:
+            conn_c.close()
+
+        # SQLite returns aggregates of datetimes as text
+        return pd.Timestamp(first_late).to_pydatetime() if first_late is not None else None
+
+    def get_source_fingerprint(self):
+        """
+        Get cheap fingerprint of source data within calculated timeframe (computed on server)
+
+        :return: Max id and row count within timeframe
+        :rtype: tuple
+        """
+
+        sa_select = sa.select(
+            [sa.func.max(self.data_table.c.id), sa.func.count()],
+            whereclause=self.window_clause())
+
+        conn_c = self.engine.connect()
+        try:
+            max_id, count = conn_c.execute(sa_select).fetchone()
+        finally:
+            conn_c.close()
+
+        return max_id, count
 
     def get_guery_df(self):
         """
@@ -129,6 +382,15 @@ class ModelClass(object):
 
         return self.query_df
 
+    def set_query_df(self, query_df):
+        """
+        Set query dataframe to rows fetched elsewhere
+
+        :param dataframe query_df: Dataframe from query of SQL database
+        """
+
+        self.query_df = query_df
+
     def get_model_df(self):
         """
         Get model dataframe
@@ -148,14 +410,16 @@ class ModelClass(object):
 
         return self.min_increments
 
-    def set_model_output(self, path):
+    def set_model_output(self, path, include_table=False):
         """
         Set output path and file for model
 
         :param str path: Path for output directory of model
+        :param bool include_table: Include name of table in file name
         """
 
-        file = f'model_R{str(self.time_span).replace(".", "_")} ({str(self.date_time).replace(":","_")}).csv'
+        table = f'{self.table}_' if include_table else ''
+        file = f'model_{table}R{str(self.time_span).replace(".", "_")} ({str(self.date_time).replace(":","_")}).csv'
         self.model_output_file = path_inc(path, file)
 
     def get_model_output(self):
@@ -168,14 +432,16 @@ class ModelClass(object):
 
         return self.model_output_file
 
-    def set_query_output(self, path):
+    def set_query_output(self, path, include_table=False):
         """
         Set output path and file for query
 
         :param str path: Path for output directory of query
+        :param bool include_table: Include name of table in file name
         """
 
-        file = f'sql_query_R{str(self.time_span).replace(".", "_")} ({str(self.date_time).replace(":","_")}).csv'
+        table = f'{self.table}_' if include_table else ''
+        file = f'sql_query_{table}R{str(self.time_span).replace(".", "_")} ({str(self.date_time).replace(":","_")}).csv'
         self.query_output_file = path_inc(path, file)
 
     def get_query_output(self):
@@ -193,25 +459,42 @@ class ModelClass(object):
         Create csv for query and output to directory specified
         """
 
-        self.query_df.to_csv(self.query_output_file)
+        if self.spill_store is None:
+            self.query_df.to_csv(self.query_output_file)
+            return
+
+        # write spilled partitions one at a time
+        header = True
+        for _bucket, part_df in self.spill_store.iter_partitions():
+            part_df.to_csv(self.query_output_file, mode='w' if header else 'a', header=header)
+            header = False
+
+        if header:
+            pd.DataFrame(columns=[c.name for c in self.data_table.columns]).to_csv(self.query_output_file)
 
-    def create_model_csv(self):
+    def create_model_csv(self, workers=None):
         """
         Create csv for model and output to directory specified
+
+        :param int workers: Number of processes formatting blocks of model (None uses csv_workers of config.py)
         """
 
-        self.model_df.to_csv(self.model_output_file)
+        write_model_csv(self.model_df, self.model_output_file, self.get_flag_columns(),
+                        chunk_rows=csv_chunk_rows, chunk_columns=csv_chunk_columns,
+                        workers=workers if workers is not None else csv_workers)
 
-    def create_subset_list(self):
+    def create_subset_list(self, time_steps=None):
         """
         Create list of subset objects that store details of each timestep block
+
+        :param list time_steps: Timesteps to create subsets for (None for all timesteps)
         """
 
-        row = 0
-        for time_step in self.min_increments:
+        for row, time_step in enumerate(self.min_increments):
+            if time_steps is not None and time_step not in time_steps:
+                continue
             subset = SubsetClass(time_step=time_step, query_df=self.query_df, model_df=self.model_df, row=row)
             self.subset_list.append(subset)
-            row += 1
 
     def get_subset_list(self):
         """
@@ -240,6 +523,62 @@ class ModelClass(object):
             if not status_list.__contains__(True):
                 running = False
 
+    def build_model_df(self, backend):
+        """
+        Aggregate query dataframe into model dataframe using backend
+
+        :param AggregationBackend backend: Backend used for aggregation
+        """
+
+        if self.spill_store is None:
+            self.model_df = backend.build_model_df(self)
+        else:
+            # aggregate spilled partitions one timestep at a time
+            for bucket, part_df in self.spill_store.iter_partitions():
+                if not 0 <= bucket < len(self.min_increments):
+                    continue
+
+                ts = self.min_increments[bucket]
+                self.query_df = part_df
+                self.subset_list = []
+                part_model_df = backend.build_model_df(self, time_steps=[ts])
+                self.model_df.loc[ts] = part_model_df.loc[ts]
+
+            self.query_df = None
+
+        # fill timesteps read from summary
+        if self.summary_df is not None:
+            summary_df = self.summary_df
+            self.add_tag_types(set(summary_df.loc[summary_df['is_flag'], '_NAME']),
+                               set(summary_df.loc[~summary_df['is_flag'], '_NAME']))
+            self.model_df.update(summary_df.pivot(index='bucket', columns='_NAME', values='value'))
+
+        # boolean tags are stored as (nullable) int8
+        flag_columns = list(self.get_flag_columns())
+        if flag_columns:
+            self.model_df[flag_columns] = self.model_df[flag_columns].astype('Int8')
+
+    def add_tag_types(self, flag_tags, float_tags):
+        """
+        Record tags filled with boolean and float values
+
+        :param set flag_tags: Tags filled with boolean values
+        :param set float_tags: Tags filled with float values
+        """
+
+        self.flag_tags.update(flag_tags)
+        self.float_tags.update(float_tags)
+
+    def get_flag_columns(self):
+        """
+        Get columns of model holding only boolean values
+
+        :return: Set of columns
+        :rtype: set
+        """
+
+        return self.flag_tags - self.float_tags
+
     def set_model_df_at_time_step(self):
         """
         Set model dataframe at timestep to subset dataframe for entire row
@@ -248,3 +587,4 @@ class ModelClass(object):
         for subset in self.subset_list:
             ts = subset.get_time_step()
             self.model_df.loc[ts] = subset.get_model_df().loc[ts]
+            self.add_tag_types(subset.get_flag_tags(), subset.get_float_tags())
@@ -24,6 +24,8 @@ class SubsetClass(object):
         self.subset_df = query_df.query(f'\"{self.start}\" < {column_index} <= \"{self.end}\"')
         self.timestep_model_df = model_df.query(f'{column_index} == \"{self.time_step}\"')
         self.row = row
+        self.flag_tags = set()
+        self.float_tags = set()
         self.thread = Thread(target=self.fill_model_df_row)
         self.thread_finished = False
 
@@ -64,6 +66,26 @@ class SubsetClass(object):
 
         return self.timestep_model_df
 
+    def get_flag_tags(self):
+        """
+        Get tags filled with boolean values
+
+        :return: Set of tags
+        :rtype: set
+        """
+
+        return self.flag_tags
+
+    def get_float_tags(self):
+        """
+        Get tags filled with float values
+
+        :return: Set of tags
+        :rtype: set
+        """
+
+        return self.float_tags
+
     def get_time_step(self):
         """
         Get timestep of SubsetClass object
@@ -127,7 +149,8 @@ class SubsetClass(object):
 
                 if not xval == 1 and not xval == 0:
                     # take the average of float values
-                    value = format(xval / len(vals_df), '.5g')
+                    value = xval / len(vals_df)
+                    self.float_tags.add(xitem)
 
                     if debug:
                         # display output messages when filling point into dataframe
@@ -135,7 +158,7 @@ class SubsetClass(object):
                             f'{Fore.LIGHTCYAN_EX}'
                             f'\n\tFilled point: ({str(self.time_step)}) X ({xitem}) with: '
                             f'{Fore.LIGHTMAGENTA_EX} (ROW: {self.row})(COL {c_idx}): '
-                            f'{Fore.LIGHTWHITE_EX}{value}'
+                            f'{Fore.LIGHTWHITE_EX}{value:.5g}'
                             f'{Style.RESET_ALL}')
 
                     # set average into dataframe
@@ -147,9 +170,9 @@ class SubsetClass(object):
                     value = xval
 
                     if isinstance(value, int):
-                        value = format(value, '.0f')
-                    if isinstance(value, float):
-                        value = format(value, '.1f')
+                        self.flag_tags.add(xitem)
+                    else:
+                        self.float_tags.add(xitem)
 
                     if debug:
                         # display output messages when filling point into dataframe
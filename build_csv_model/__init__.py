@@ -1,17 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+from fnmatch import fnmatch
 from pathlib import WindowsPath, PosixPath
 from colorama import Fore, Style
 import pandas as pd
+import sqlalchemy as sa
 import time
 import os
 
 from .ModelClass import ModelClass
+from .cache import ModelCache
+from .backends import get_backend
+from .database import create_db_engine
+from .profiler import RunProfiler
+from .summary import is_summary_table
 
 # import config.py variables
 from .config import db, server, user, _table, column_index, _sample_date, _sample_time, _time_span, column_name
+from .config import cache_dir, cache_max_entries, cache_max_bytes, backend as _backend
+from .config import multi_max_workers, csv_chunk_rows, csv_chunk_columns, csv_workers
 
 # import helper functions from helper.py
 from .helper import test_sql_details, test_date_and_time, default_model, default_query, check_output_dirs, convert_time, time_calc, convert_date
+from .helper import path_inc, write_model_csv
 
 # default SQL driver (Windows)
 driver = 'SQL SERVER'
@@ -38,7 +49,10 @@ def create_model(sample_date=_sample_date,
                  time_span=_time_span,
                  tag_name=column_name,
                  model_path=None,
-                 query_path=None):
+                 query_path=None,
+                 use_cache=True,
+                 backend=_backend,
+                 profile=None):
     """Create CSV model from database
 
     :param str sample_date: Date of sample YYYY-MM-DD
@@ -48,8 +62,17 @@ def create_model(sample_date=_sample_date,
     :param str tag_name: Column name for tags
     :param str model_path: Output directory for CSV model
     :param str query_path: Output directory for CSV query
+    :param bool use_cache: Return previously built model if parameters and source data are unchanged
+    :param str backend: Aggregation backend for model ('pandas' or 'duckdb')
+    :param bool profile: Write profile report of build next to model (None uses BUILD_CSV_MODEL_PROFILE variable)
+
+    :return: Output file path for model
+    :rtype: str
     """
 
+    if profile is None:
+        profile = os.environ.get('BUILD_CSV_MODEL_PROFILE', '0') not in ('', '0', 'false', 'False')
+
     # display SQL connection details
     print(
         f'{Fore.CYAN}\nCONNECTION DETAILS:{Style.RESET_ALL}{Fore.LIGHTWHITE_EX}'
@@ -68,6 +91,9 @@ def create_model(sample_date=_sample_date,
     # test sample date and time
     test_date_and_time(sample_date, sample_time)
 
+    # resolve aggregation backend
+    aggregation_backend = get_backend(backend)
+
     default_m = False
     default_q = False
 
@@ -90,37 +116,236 @@ def create_model(sample_date=_sample_date,
 
     model = ModelClass(date_time=_dt, time_span=time_span, table=table, column_index=column_index, column_name=tag_name)
 
+    cache = None
+    cache_key = None
+
+    if use_cache:
+        cache = ModelCache(path=cache_dir or os.path.join(default_path, 'modeling', 'model_cache'),
+                           max_entries=cache_max_entries,
+                           max_bytes=cache_max_bytes)
+        cache_key = cache.make_key(table, _dt, time_span, tag_name, aggregation_backend.name,
+                                   model.get_source_fingerprint())
+        cached_file = cache.get(cache_key)
+
+        if cached_file is not None:
+            # display output for cache hit
+            print(
+                f'{Fore.LIGHTGREEN_EX}'
+                f'\nCached Model Found: {Fore.YELLOW}{cached_file}'
+                f'{Style.RESET_ALL}')
+
+            return cached_file
+
     model.set_model_output(model_path)
     model.set_query_output(query_path)
-    model.create_query_df()
-    model.init_model_df()
 
-    # display output for file save
-    print(
-        f'{Fore.LIGHTGREEN_EX}'
-        f'\nSQL Query Saved: {Fore.YELLOW}{model.get_query_output()}'
-        f'{Style.RESET_ALL}')
+    profiler = None
+    workers = None
+    if profile:
+        profiler = RunProfiler()
+
+        # only this process is sampled, so csv blocks are formatted here instead of in worker processes
+        if csv_workers > 1:
+            workers = 1
+            profiler.add_note(f'csv_workers={csv_workers} ignored while profiling, csv formatted in this process')
 
-    model.create_query_csv()
+        profiler.start()
+
+    try:
+        model.build(aggregation_backend, workers=workers)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            report_file, collapsed_file = profiler.write_report(os.path.splitext(model.get_model_output())[0])
+
+            # display output for profile save
+            print(
+                f'{Fore.LIGHTGREEN_EX}'
+                f'\nProfile Saved: {Fore.YELLOW}{report_file}{Fore.LIGHTGREEN_EX} and {Fore.YELLOW}{collapsed_file}'
+                f'{Style.RESET_ALL}')
+
+    if cache is not None:
+        cache.put(cache_key, model.get_model_output())
+
+    # display time elapsed
+    end_time = time.time()
+    hours_t, min_t, sec_t = time_calc(end_time - start_time)
 
-    # display output for size of dataframe
     print(
-        f'{Fore.LIGHTGREEN_EX}'
-        f'\tBase Dataframe Created with {Fore.YELLOW}{len(model.get_model_df().columns)} '
-        f'{Fore.LIGHTGREEN_EX}columns.{Fore.LIGHTGREEN_EX}'
+        f'{Fore.LIGHTBLUE_EX}'
+        f'\nTime Elapsed: {Fore.LIGHTMAGENTA_EX}{hours_t} hours {min_t} minutes {sec_t} seconds.'
         f'{Style.RESET_ALL}')
 
-    model.create_subset_list()
-    model.wait_for_threads_of_subclass()
-    model.set_model_df_at_time_step()
+    return model.get_model_output()
+
 
-    # display output for file save
+def create_models(sample_date=_sample_date,
+                  sample_time=_sample_time,
+                  tables=None,
+                  table_pattern=None,
+                  time_span=_time_span,
+                  tag_name=column_name,
+                  model_path=None,
+                  query_path=None,
+                  combined=False,
+                  max_workers=multi_max_workers,
+                  backend=_backend,
+                  engine=None):
+    """Create CSV models for several tables over the same timeframe concurrently
+
+    :param str sample_date: Date of sample YYYY-MM-DD
+    :param str sample_time: Time of sample HH:MM:SS
+    :param list tables: Names of target tables in database
+    :param str table_pattern: Shell-style pattern of target tables in database, e.g. 'HISTORY_*'
+    :param str time_span: Length of time needed for data in hours
+    :param str tag_name: Column name for tags
+    :param str model_path: Output directory for CSV models
+    :param str query_path: Output directory for CSV queries
+    :param bool combined: Create one wide model with columns prefixed by table instead of one model per table
+    :param int max_workers: Number of tables built concurrently (and size of shared connection pool)
+    :param str backend: Aggregation backend for models ('pandas' or 'duckdb')
+    :param engine: SQLAlchemy engine to query (None creates engine from config.py with max_workers pooled)
+
+    :return: Output file path for each table (None if its build failed), or output file path of combined model
+        (None if all builds failed)
+    :rtype: dict or str
+    """
+
+    # display SQL connection details
     print(
-        f'{Fore.LIGHTGREEN_EX}'
-        f'\nOutput Model Saved: {Fore.YELLOW}{model.get_model_output()}'
-        f'{Style.RESET_ALL}')
+        f'{Fore.CYAN}\nCONNECTION DETAILS:{Style.RESET_ALL}{Fore.LIGHTWHITE_EX}'
+        f'\n\tSERVER: {server}'
+        f'\n\tDRIVER: {driver}'
+        f'\n\tDB: {db}'
+        f'\n\tUSER: {user}'
+        f'\n{Style.RESET_ALL}')
+
+    # test sample date and time
+    test_date_and_time(sample_date, sample_time)
+
+    # resolve aggregation backend
+    aggregation_backend = get_backend(backend)
+
+    # shared engine, one pooled connection per worker
+    own_engine = engine is None
+    if own_engine:
+        engine = create_db_engine(pool_size=max_workers)
+    table_names = sa.inspect(engine).get_table_names()
 
-    model.create_model_csv()
+    # explicit tables first, then tables matching pattern (skipping summary tables of matched tables)
+    tables = list(dict.fromkeys(tables or []))
+    if table_pattern is not None:
+        tables += [t for t in table_names
+                   if fnmatch(t, table_pattern) and not is_summary_table(t) and t not in tables]
+
+    missing = [t for t in tables if t not in table_names]
+    if missing or not tables:
+        print(f'{Fore.RED}'
+              f'\nNo tables to build, or tables do not exist: {Fore.LIGHTRED_EX}{", ".join(missing)}'
+              f'{Style.RESET_ALL}')
+        exit(1)
+
+    default_m = False
+    default_q = False
+
+    # use default if no directories specified
+    if model_path is None:
+        model_path = default_model(default_path)
+        default_m = True
+    if query_path is None:
+        query_path = default_query(default_path)
+        default_q = True
+
+    # check path of model and query output directories
+    check_output_dirs(model_path, query_path, default_m, default_q)
+
+    # start timer
+    start_time = time.time()
+
+    # create datetime string
+    _dt = datetime.combine(convert_date(sample_date), convert_time(sample_time))
+
+    def build(table):
+        """Build model of one table
+
+        :param str table: Name of target table in database
+
+        :return: Built model
+        :rtype: ModelClass
+        """
+
+        model = ModelClass(date_time=_dt, time_span=time_span, table=table, column_index=column_index,
+                           column_name=tag_name, engine=engine)
+
+        model.set_model_output(model_path, include_table=True)
+        model.set_query_output(query_path, include_table=True)
+
+        model.build(aggregation_backend, write_model=not combined)
+
+        print(
+            f'{Fore.LIGHTGREEN_EX}'
+            f'\nModel Built for {Fore.YELLOW}{table}{Fore.LIGHTGREEN_EX} with {Fore.YELLOW}'
+            f'{len(model.get_model_df().columns)}{Fore.LIGHTGREEN_EX} columns.'
+            f'{Style.RESET_ALL}')
+
+        return model
+
+    models = {}
+    failures = {}
+
+    # collect each table as it finishes, a failed table does not stop the others
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(build, table): table for table in tables}
+        for future in as_completed(futures):
+            table = futures[future]
+            try:
+                models[table] = future.result()
+            except Exception as e:
+                failures[table] = e
+                print(
+                    f'{Fore.RED}'
+                    f'\nModel Failed for {Fore.LIGHTRED_EX}{table}{Fore.RED}: {Fore.LIGHTRED_EX}{e}'
+                    f'{Style.RESET_ALL}')
+
+    # keep order of tables
+    models = {t: models[t] for t in tables if t in models}
+
+    if combined and not models:
+        result = None
+    elif combined:
+        combined_df = pd.concat([m.get_model_df().add_prefix(f'{t}.') for t, m in models.items()], axis=1)
+        flag_columns = {f'{t}.{c}' for t, m in models.items() for c in m.get_flag_columns()}
+
+        file = f'model_combined_R{str(time_span).replace(".", "_")} ({str(_dt).replace(":","_")}).csv'
+        result = path_inc(model_path, file)
+        write_model_csv(combined_df, result, flag_columns, chunk_rows=csv_chunk_rows, chunk_columns=csv_chunk_columns,
+                        workers=csv_workers)
+
+        # display output for file save
+        print(
+            f'{Fore.LIGHTGREEN_EX}'
+            f'\nCombined Model Saved: {Fore.YELLOW}{result}'
+            f'{Style.RESET_ALL}')
+    else:
+        result = {t: models[t].get_model_output() if t in models else None for t in tables}
+
+        for model_file in result.values():
+            if model_file is not None:
+                # display output for file save
+                print(
+                    f'{Fore.LIGHTGREEN_EX}'
+                    f'\nOutput Model Saved: {Fore.YELLOW}{model_file}'
+                    f'{Style.RESET_ALL}')
+
+    if failures:
+        # display failed tables
+        print(
+            f'{Fore.RED}'
+            f'\n{len(failures)} of {len(tables)} models failed: {Fore.LIGHTRED_EX}{", ".join(failures)}'
+            f'{Style.RESET_ALL}')
+
+    if own_engine:
+        engine.dispose()
 
     # display time elapsed
     end_time = time.time()
@@ -131,6 +356,8 @@ def create_model(sample_date=_sample_date,
         f'\nTime Elapsed: {Fore.LIGHTMAGENTA_EX}{hours_t} hours {min_t} minutes {sec_t} seconds.'
         f'{Style.RESET_ALL}')
 
+    return result
+
 
 # MAIN
 if __name__ == '__main__':
@@ -0,0 +1,217 @@
+from colorama import Fore, Style
+from datetime import datetime
+import sqlalchemy as sa
+import argparse
+
+from .ModelClass import ModelClass
+from .database import get_db_engine
+from .helper import test_date_and_time, convert_date, convert_time
+from .config import column_index, column_name, _table, _sample_date, _sample_time, _time_span
+
+# key columns of the recommended covering index, the other queried columns are included
+index_columns = ['_TIMESTAMP', '_NAME']
+
+
+def get_include_columns(model):
+    """Get columns of the select of model that are not key columns of the covering index
+
+    :param ModelClass model: Model to check
+
+    :return: Columns to include in covering index
+    :rtype: list
+    """
+
+    return [column.name for column in model.data_table.columns if column.name not in index_columns]
+
+
+def get_included_columns(index):
+    """Get included (non-key) columns of reflected index
+
+    :param dict index: Reflected index
+
+    :return: Included columns
+    :rtype: list
+    """
+
+    dialect_options = index.get('dialect_options', {})
+
+    return list(index.get('include_columns') or dialect_options.get('mssql_include') or [])
+
+
+def find_covering_index(indexes, include_columns):
+    """Find index on (_TIMESTAMP, _NAME) that includes the other queried columns
+
+    :param list indexes: Reflected indexes of table
+    :param list include_columns: Columns the index has to include
+
+    :return: Covering index or None
+    :rtype: dict
+    """
+
+    for index in indexes:
+        key_columns = list(index['column_names'])
+        if key_columns[:len(index_columns)] != index_columns:
+            continue
+        if all(c in key_columns or c in get_included_columns(index) for c in include_columns):
+            return index
+
+    return None
+
+
+def get_query_plan(engine, sa_select):
+    """Capture query plan of select
+
+    :param engine: SQLAlchemy engine
+    :param sa_select: SQLAlchemy select
+
+    :return: Lines of query plan
+    :rtype: list
+    """
+
+    compiled = sa_select.compile(engine)
+    params = [compiled.params[k] for k in compiled.positiontup] if compiled.positional else compiled.params
+    dialect = engine.dialect.name
+
+    raw_conn = engine.raw_connection()
+    try:
+        cursor = raw_conn.cursor()
+
+        if dialect == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {compiled}', params)
+            return [str(row[-1]) for row in cursor.fetchall()]
+
+        if dialect == 'mssql':
+            cursor.execute('SET SHOWPLAN_TEXT ON')
+            try:
+                cursor.execute(str(compiled), params)
+
+                # first result set is the statement, following ones are the plan
+                lines = []
+                while True:
+                    lines += [str(row[0]) for row in cursor.fetchall()]
+                    if not cursor.nextset():
+                        break
+            finally:
+                cursor.execute('SET SHOWPLAN_TEXT OFF')
+
+            return lines[1:]
+
+        cursor.execute(f'EXPLAIN {compiled}', params)
+        return [' '.join(str(x) for x in row) for row in cursor.fetchall()]
+    finally:
+        raw_conn.close()
+
+
+def get_index_ddl(engine, table, include_columns):
+    """Get DDL to create covering index for table
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of table in database
+    :param list include_columns: Columns to include in index
+
+    :return: DDL statement
+    :rtype: str
+    """
+
+    quote = engine.dialect.identifier_preparer.quote
+    name = quote(f'IX_{table}_TIMESTAMP_NAME')
+
+    if engine.dialect.name == 'mssql':
+        return (f'CREATE NONCLUSTERED INDEX {name} ON {quote(table)} '
+                f'({", ".join(quote(c) for c in index_columns)}) '
+                f'INCLUDE ({", ".join(quote(c) for c in include_columns)})')
+
+    # no included columns, add them to the key instead
+    return (f'CREATE INDEX {name} ON {quote(table)} '
+            f'({", ".join(quote(c) for c in index_columns + include_columns)})')
+
+
+def get_index_report(model):
+    """Inspect indexes of table of model and plan of its generated select
+
+    :param ModelClass model: Model to check
+
+    :return: Report with indexes, covering index, query plan and verdict
+    :rtype: dict
+    """
+
+    include_columns = get_include_columns(model)
+    indexes = sa.inspect(model.engine).get_indexes(model.table)
+    covering = find_covering_index(indexes, include_columns)
+    plan = get_query_plan(model.engine, model.get_query_select(0, 100000))
+    plan_text = '\n'.join(plan)
+
+    used = [index['name'] for index in indexes if index['name'] and index['name'] in plan_text]
+
+    return {
+        'table': model.table,
+        'indexes': indexes,
+        'include_columns': include_columns,
+        'covering_index': covering['name'] if covering else None,
+        'plan': plan,
+        'indexes_used': used,
+        'covering_index_used': covering is not None and covering['name'] in used,
+        'seek': 'SEARCH' in plan_text or 'Index Seek' in plan_text,
+        'sort': 'TEMP B-TREE' in plan_text or 'Sort(' in plan_text,
+        'lookup': 'Key Lookup' in plan_text or 'RID Lookup' in plan_text,
+        'ddl': None if covering else get_index_ddl(model.engine, model.table, include_columns),
+    }
+
+
+def print_index_report(report, ddl=False):
+    """Display report of index advisor
+
+    :param dict report: Report from get_index_report
+    :param bool ddl: Display DDL to create covering index if missing
+    """
+
+    print(f'{Fore.CYAN}\nINDEXES OF {report["table"]}:{Style.RESET_ALL}{Fore.LIGHTWHITE_EX}')
+    for index in report['indexes']:
+        included = get_included_columns(index)
+        print(f'\t{index["name"]}: ({", ".join(index["column_names"])})'
+              f'{" INCLUDE (" + ", ".join(included) + ")" if included else ""}')
+    print(f'{Style.RESET_ALL}')
+
+    print(f'{Fore.CYAN}QUERY PLAN:{Style.RESET_ALL}{Fore.LIGHTWHITE_EX}')
+    for line in report['plan']:
+        print(f'\t{line}')
+    print(f'{Style.RESET_ALL}')
+
+    if report['covering_index_used']:
+        print(f'{Fore.GREEN}Covering index {Fore.LIGHTGREEN_EX}{report["covering_index"]}{Fore.GREEN} '
+              f'is used by the query.{Style.RESET_ALL}')
+    elif report['covering_index'] is not None:
+        print(f'{Fore.YELLOW}Covering index {report["covering_index"]} exists but is not used by the query.'
+              f'{Style.RESET_ALL}')
+    else:
+        print(f'{Fore.RED}No covering index on ({", ".join(index_columns)}) including '
+              f'{", ".join(report["include_columns"])}.{Style.RESET_ALL}')
+
+    if not report['seek']:
+        print(f'{Fore.RED}The _TIMESTAMP range is read with a full scan.{Style.RESET_ALL}')
+    if report['sort']:
+        print(f'{Fore.YELLOW}Rows are sorted by _NUMERICID after they are read.{Style.RESET_ALL}')
+    if report['lookup']:
+        print(f'{Fore.YELLOW}Rows are looked up in the base table for missing columns.{Style.RESET_ALL}')
+
+    if ddl and report['ddl'] is not None:
+        print(f'{Fore.CYAN}\nDDL:{Style.RESET_ALL}\n{report["ddl"]};')
+
+
+# MAIN
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check indexes and query plan of the _TIMESTAMP range scan')
+    parser.add_argument('--table', default=_table)
+    parser.add_argument('--sample-date', default=_sample_date)
+    parser.add_argument('--sample-time', default=_sample_time)
+    parser.add_argument('--time-span', type=float, default=_time_span)
+    parser.add_argument('--ddl', action='store_true', help='Display DDL to create covering index if missing')
+    args = parser.parse_args()
+
+    test_date_and_time(args.sample_date, args.sample_time)
+    _dt = datetime.combine(convert_date(args.sample_date), convert_time(args.sample_time))
+
+    print_index_report(get_index_report(ModelClass(date_time=_dt, time_span=args.time_span, table=args.table,
+                                                   column_index=column_index, column_name=column_name,
+                                                   engine=get_db_engine())),
+                       ddl=args.ddl)
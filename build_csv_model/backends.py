@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+
+from .helper import resolve_tag_values
+from .config import duckdb_threads
+
+
+class AggregationBackend(object):
+    """
+    Base class for backends that aggregate query data into the model matrix
+    """
+    name = None
+
+    def build_model_df(self, model, time_steps=None):
+        """
+        Aggregate query dataframe of model into model dataframe
+
+        :param ModelClass model: Model with query and model dataframes initialized
+        :param list time_steps: Timesteps to aggregate (None for all timesteps)
+
+        :return: Dataframe for model
+        :rtype: dataframe
+        """
+
+        raise NotImplementedError
+
+
+class PandasBackend(AggregationBackend):
+    """
+    Reference backend, fills each timestep of the model in its own thread using pandas
+    """
+    name = 'pandas'
+
+    def build_model_df(self, model, time_steps=None):
+        """
+        Aggregate query dataframe of model into model dataframe
+
+        :param ModelClass model: Model with query and model dataframes initialized
+        :param list time_steps: Timesteps to aggregate (None for all timesteps)
+
+        :return: Dataframe for model
+        :rtype: dataframe
+        """
+
+        model.create_subset_list(time_steps)
+        model.wait_for_threads_of_subclass()
+        model.set_model_df_at_time_step()
+
+        return model.get_model_df()
+
+
+class DuckDBBackend(AggregationBackend):
+    """
+    Backend that aggregates timestep buckets and tags with DuckDB's in-process columnar engine
+    """
+    name = 'duckdb'
+
+    def __init__(self, threads=None):
+        """
+        Constructor for DuckDBBackend
+
+        :param int threads: Number of DuckDB worker threads (None uses DuckDB default)
+        """
+
+        self.threads = threads
+
+    def build_model_df(self, model, time_steps=None):
+        """
+        Aggregate query dataframe of model into model dataframe
+
+        :param ModelClass model: Model with query and model dataframes initialized
+        :param list time_steps: Timesteps to aggregate (None for all timesteps)
+
+        :return: Dataframe for model
+        :rtype: dataframe
+        """
+
+        import duckdb
+
+        min_increments = model.get_min_increments()
+        model_df = model.get_model_df()
+        column_index = model.column_index
+        column_name = model.column_name
+
+        query_df = model.get_guery_df()
+
+        # nothing to aggregate (an empty result also has no typed _TIMESTAMP column for DuckDB)
+        if len(query_df) == 0:
+            return pd.DataFrame(index=model_df.index, columns=model_df.columns, dtype='float64')
+
+        # position of each row in query order, values of a tag are read in this order
+        rows_df = query_df[[column_index, column_name, '_VALUE']].assign(_ROW=np.arange(len(query_df)))
+
+        con = duckdb.connect(database=':memory:')
+        try:
+            if self.threads:
+                con.execute(f'SET threads TO {int(self.threads)}')
+
+            con.register('query_df', rows_df)
+
+            # bucket n holds rows in (min_increments[n] - 10 min, min_increments[n]], floats are summed in query
+            # order after the last '0' of their bucket and tag (see helper.resolve_tag_values)
+            result = con.execute(
+                f'''
+                SELECT bucket,
+                       tag,
+                       count(*) AS value_count,
+                       bool_or(value = '1') AS any_true,
+                       sum(CAST(value AS DOUBLE) ORDER BY pos) FILTER (WHERE is_tail AND is_float) AS tail_sum,
+                       count(*) FILTER (WHERE is_tail AND is_float) AS tail_count
+                FROM (
+                    SELECT bucket,
+                           tag,
+                           value,
+                           pos,
+                           value NOT IN ('0', '1') AS is_float,
+                           pos > coalesce(max(CASE WHEN value = '0' THEN pos END)
+                                              OVER (PARTITION BY bucket, tag), -1) AS is_tail
+                    FROM (
+                        SELECT CAST(ceil((epoch_us("{column_index}") - epoch_us(CAST(? AS TIMESTAMP))) / 600000000.0)
+                                        AS BIGINT)
+                                   AS bucket,
+                               "{column_name}" AS tag,
+                               "_VALUE" AS value,
+                               "_ROW" AS pos
+                        FROM query_df
+                    )
+                    WHERE bucket BETWEEN 0 AND ?
+                )
+                GROUP BY bucket, tag
+                ''',
+                [min_increments[0], len(min_increments) - 1]).df()
+        finally:
+            con.close()
+
+        result = resolve_tag_values(result)
+        model.add_tag_types(set(result.loc[result['is_flag'], 'tag']), set(result.loc[~result['is_flag'], 'tag']))
+        result[column_index] = [min_increments[bucket] for bucket in result['bucket']]
+
+        pivot_df = result.pivot(index=column_index, columns='tag', values='value')
+
+        return pivot_df.reindex(index=model_df.index, columns=model_df.columns)
+
+
+backends = {
+    PandasBackend.name: PandasBackend,
+    DuckDBBackend.name: DuckDBBackend,
+}
+
+
+def get_backend(name):
+    """
+    Get aggregation backend by name
+
+    :param str name: Name of backend ('pandas' or 'duckdb')
+
+    :return: Aggregation backend
+    :rtype: AggregationBackend
+    """
+
+    if name not in backends:
+        raise ValueError(f'Unknown aggregation backend: {name}, should be one of {", ".join(backends)}')
+
+    if name == DuckDBBackend.name:
+        return DuckDBBackend(threads=duckdb_threads)
+
+    return backends[name]()
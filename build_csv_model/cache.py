@@ -0,0 +1,161 @@
+from colorama import Fore, Style
+from threading import Lock
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .helper import write_json_file
+from .config import debug
+
+# index is shared by every cache instance of the process (create_model creates one per call)
+index_lock = Lock()
+
+
+class ModelCache(object):
+    """
+    Class that stores previously built models keyed by model parameters and a source fingerprint
+    """
+    def __init__(self, path, max_entries=32, max_bytes=512 * 1024 * 1024):
+        """
+        Constructor for ModelCache
+
+        :param str path: Directory to store cached models in
+        :param int max_entries: Maximum number of models kept in cache
+        :param int max_bytes: Maximum size of all cached models in bytes
+        """
+
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(self.path, 'index.json')
+
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def make_key(table, date_time, time_span, column_name, backend, fingerprint):
+        """
+        Create cache key for a model
+
+        :param str table: Name of table in database
+        :param datetime date_time: Datetime of sample
+        :param float time_span: Amount of time spanned in hours
+        :param str column_name: Column name of tags in database
+        :param str backend: Name of aggregation backend building the model
+        :param tuple fingerprint: Source fingerprint of window (max id, row count)
+
+        :return: Cache key
+        :rtype: str
+        """
+
+        raw = '|'.join([str(table), str(date_time), str(float(time_span)), str(column_name), str(backend),
+                        ','.join(str(x) for x in fingerprint)])
+
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def read_index(self):
+        """
+        Read index of cached models
+
+        :return: Index of cached models
+        :rtype: dict
+        """
+
+        if not os.path.exists(self.index_file):
+            return {}
+
+        try:
+            with open(self.index_file, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            # unreadable index, start over
+            return {}
+
+    def write_index(self, index):
+        """
+        Write index of cached models
+
+        :param dict index: Index of cached models
+        """
+
+        write_json_file(self.index_file, index)
+
+    def get(self, key):
+        """
+        Get cached model for key
+
+        :param str key: Cache key
+
+        :return: Path of cached model or None if not cached
+        :rtype: str
+        """
+
+        with index_lock:
+            index = self.read_index()
+            entry = index.get(key)
+
+            if entry is None:
+                return None
+
+            # drop entries whose file was removed outside of the cache
+            if not os.path.exists(entry['file']):
+                del index[key]
+                self.write_index(index)
+                return None
+
+            entry['last_access'] = time.time()
+            self.write_index(index)
+
+            return entry['file']
+
+    def put(self, key, model_file):
+        """
+        Store built model in cache
+
+        :param str key: Cache key
+        :param str model_file: Path of model file to cache
+
+        :return: Path of cached model
+        :rtype: str
+        """
+
+        cached_file = os.path.join(self.path, f'{key}.csv')
+
+        with index_lock:
+            shutil.copyfile(model_file, cached_file)
+
+            index = self.read_index()
+            index[key] = {
+                'file': cached_file,
+                'source': model_file,
+                'size': os.path.getsize(cached_file),
+                'last_access': time.time(),
+            }
+            self.evict(index)
+            self.write_index(index)
+
+        return cached_file
+
+    def evict(self, index):
+        """
+        Evict least recently used models until cache is within its limits
+
+        :param dict index: Index of cached models
+        """
+
+        total = sum(entry['size'] for entry in index.values())
+
+        # least recently used first
+        for key in sorted(index, key=lambda k: index[k]['last_access']):
+            if len(index) <= self.max_entries and total <= self.max_bytes:
+                break
+
+            entry = index.pop(key)
+            total -= entry['size']
+
+            if os.path.exists(entry['file']):
+                os.remove(entry['file'])
+
+            if debug:
+                print(f'{Fore.LIGHTYELLOW_EX}Evicted cached model: {entry["file"]}{Style.RESET_ALL}')
@@ -9,3 +9,28 @@ _sample_date = 'yourdate'
 _sample_time = 'yourtime'
 _time_span = 2
 debug = True
+cache_dir = None
+cache_max_entries = 32
+cache_max_bytes = 512 * 1024 * 1024
+backend = 'pandas'
+duckdb_threads = None
+spill_memory_budget = None
+spill_dir = None
+service_max_windows = 8
+csv_chunk_rows = 1000
+csv_chunk_columns = 500
+csv_workers = 1
+multi_max_workers = 4
+chunk_size = 100000
+chunk_autotune = True
+chunk_min_size = 10000
+chunk_max_size = 2000000
+chunk_max_latency = 30.0
+chunk_max_bytes = 256 * 1024 * 1024
+chunk_state_file = None
+fetcher = 'pandas'
+fetch_batch_size = 100000
+scheduler_max_connections = 4
+scheduler_max_workers = 2
+use_summary = False
+summary_batch_size = 500000
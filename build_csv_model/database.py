@@ -1,4 +1,5 @@
 from sqlalchemy import create_engine
+from threading import Lock
 import base64
 import os
 
@@ -10,8 +11,31 @@ driver = 'SQL SERVER'
 if os.name != 'nt':
     driver = 'ODBC Driver 17 for SQL Server'
 
-conn_string = f'mssql+pyodbc://{user}:{base64.b64decode(enc_psswd.encode("ascii")).decode("ascii")}@{server}/{db}?driver={driver}'
-engine = create_engine(conn_string, fast_executemany=True)
+# engine is created on first use, so the package can be imported (and tested) without the database
+engine = None
+engine_lock = Lock()
+
+
+def get_password():
+    """
+    Get decoded password of database
+
+    :return: Password
+    :rtype: str
+    """
+
+    return base64.b64decode(enc_psswd.encode("ascii")).decode("ascii")
+
+
+def get_conn_string():
+    """
+    Get SQLAlchemy connection string for database
+
+    :return: SQLAlchemy connection string
+    :rtype: str
+    """
+
+    return f'mssql+pyodbc://{user}:{get_password()}@{server}/{db}?driver={driver}'
 
 
 def get_db_engine():
@@ -21,4 +45,24 @@ def get_db_engine():
     :return: Return engine
     """
 
+    global engine
+
+    with engine_lock:
+        if engine is None:
+            engine = create_engine(get_conn_string(), fast_executemany=True)
+
     return engine
+
+
+def create_db_engine(pool_size=5, max_overflow=0):
+    """
+    Create database engine with sized connection pool
+
+    :param int pool_size: Number of pooled connections
+    :param int max_overflow: Number of connections allowed beyond pool size
+
+    :return: Return engine
+    """
+
+    return create_engine(get_conn_string(), fast_executemany=True, pool_size=pool_size, max_overflow=max_overflow)
+
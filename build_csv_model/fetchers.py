@@ -0,0 +1,260 @@
+from colorama import Fore, Style
+import pandas as pd
+import sqlalchemy as sa
+
+from .config import fetch_batch_size
+
+
+class Fetcher(object):
+    """
+    Base class for fetchers that read one page of the query of a model into a dataframe
+    """
+    name = None
+
+    def connect(self, model):
+        """
+        Open connection used for all pages of one query of model
+
+        :param ModelClass model: Model to fetch rows for
+
+        :return: Connection
+        """
+
+        return model.engine.connect()
+
+    def close(self, connection):
+        """
+        Close connection opened by connect
+
+        :param connection: Connection
+        """
+
+        connection.close()
+
+    def read_page(self, model, offset, chunk_size, connection):
+        """
+        Read page of rows within timeframe of model
+
+        :param ModelClass model: Model to fetch rows for
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+        :param connection: Connection opened by connect
+
+        :return: Dataframe of page
+        :rtype: dataframe
+        """
+
+        raise NotImplementedError
+
+
+class PandasFetcher(Fetcher):
+    """
+    Fallback fetcher, rows are read through pyodbc and converted to columns by pandas
+    """
+    name = 'pandas'
+
+    def read_page(self, model, offset, chunk_size, connection):
+        """
+        Read page of rows within timeframe of model
+
+        :param ModelClass model: Model to fetch rows for
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+        :param connection: SQLAlchemy connection opened by connect
+
+        :return: Dataframe of page
+        :rtype: dataframe
+        """
+
+        return pd.read_sql(model.get_query_select(offset, chunk_size), connection)
+
+
+class ArrowOdbcFetcher(Fetcher):
+    """
+    Fetcher that reads result batches straight into Arrow column buffers with arrow-odbc
+    """
+    name = 'arrow'
+
+    def __init__(self, connection_string=None, batch_size=100000):
+        """
+        Constructor for ArrowOdbcFetcher
+
+        :param str connection_string: ODBC connection string (None uses connection string of engine of model)
+        :param int batch_size: Number of rows per Arrow record batch
+        """
+
+        import pyarrow
+        from arrow_odbc import connect
+
+        self.pa = pyarrow
+        self.connect_odbc = connect
+        self.connection_string = connection_string
+        self.batch_size = batch_size
+
+    def get_connection_string(self, engine):
+        """
+        Get ODBC connection string of engine
+
+        :param engine: SQLAlchemy engine (mssql+pyodbc)
+
+        :return: ODBC connection string
+        :rtype: str
+        """
+
+        if self.connection_string is not None:
+            return self.connection_string
+
+        if engine.dialect.driver != 'pyodbc':
+            raise ValueError(f'Arrow fetcher needs a pyodbc engine or connection string, not {engine.url.drivername}')
+
+        args, _kwargs = engine.dialect.create_connect_args(engine.url)
+
+        return args[0]
+
+    def connect(self, model):
+        """
+        Open ODBC connection to database of engine of model, used for all pages of one query
+
+        :param ModelClass model: Model to fetch rows for
+
+        :return: arrow-odbc connection
+        """
+
+        return self.connect_odbc(connection_string=self.get_connection_string(model.engine))
+
+    def close(self, connection):
+        """
+        Close connection opened by connect (arrow-odbc frees it once it is no longer referenced)
+
+        :param connection: arrow-odbc connection
+        """
+
+        pass
+
+    @staticmethod
+    def get_query(model, offset, chunk_size):
+        """
+        Get SQL and text parameters of select of one page of model, compiled for engine of model
+
+        :param ModelClass model: Model to fetch rows for
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+
+        :return: SQL, list of parameters
+        :rtype: tuple
+        """
+
+        # arrow-odbc binds parameters as text, so page bounds are rendered as integers
+        sa_select = model.get_query_select(offset, chunk_size)
+        sa_select = sa_select.limit(sa.literal_column(str(int(chunk_size)))).offset(
+            sa.literal_column(str(int(offset))))
+        compiled = sa_select.compile(model.engine, compile_kwargs={'render_postcompile': True})
+
+        # ISO 8601 is converted to datetime regardless of server language
+        params = [compiled.params[k] for k in compiled.positiontup]
+        params = [p.isoformat(timespec='milliseconds') if hasattr(p, 'isoformat') else
+                  None if p is None else str(p) for p in params]
+
+        return str(compiled), params
+
+    def read_page(self, model, offset, chunk_size, connection):
+        """
+        Read page of rows within timeframe of model
+
+        :param ModelClass model: Model to fetch rows for
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+        :param connection: arrow-odbc connection opened by connect
+
+        :return: Dataframe of page
+        :rtype: dataframe
+        """
+
+        query, params = self.get_query(model, offset, chunk_size)
+
+        reader = connection.read_arrow_batches(query=query, parameters=params, batch_size=self.batch_size)
+
+        table = self.pa.Table.from_batches(list(reader), schema=reader.schema)
+
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+class SqliteFetcher(Fetcher):
+    """
+    Stand-in fetcher for tests, reads pages from a SQLite engine through sqlite3 and transposes them into columns
+    """
+    name = 'sqlite'
+
+    def connect(self, model):
+        """
+        Take raw sqlite3 connection from pool of engine of model, used for all pages of one query
+
+        :param ModelClass model: Model to fetch rows for
+
+        :return: Pooled DBAPI connection
+        """
+
+        return model.engine.raw_connection()
+
+    def read_page(self, model, offset, chunk_size, connection):
+        """
+        Read page of rows within timeframe of model
+
+        :param ModelClass model: Model to fetch rows for
+        :param int offset: Number of rows to skip
+        :param int chunk_size: Number of rows in page
+        :param connection: Pooled DBAPI connection opened by connect
+
+        :return: Dataframe of page
+        :rtype: dataframe
+        """
+
+        compiled = model.get_query_select(offset, chunk_size).compile(model.engine)
+
+        # datetimes are stored as text by SQLAlchemy's SQLite dialect
+        params = [compiled.params[k] for k in compiled.positiontup]
+        params = [p.strftime('%Y-%m-%d %H:%M:%S.%f') if hasattr(p, 'strftime') else p for p in params]
+
+        cursor = connection.cursor()
+        try:
+            cursor.execute(str(compiled), params)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        values = list(zip(*rows)) if rows else [[] for _ in columns]
+        df = pd.DataFrame({c: list(v) for c, v in zip(columns, values)}, columns=columns)
+        df[model.column_index] = pd.to_datetime(df[model.column_index])
+
+        return df
+
+
+fetchers = {
+    PandasFetcher.name: PandasFetcher,
+    ArrowOdbcFetcher.name: ArrowOdbcFetcher,
+    SqliteFetcher.name: SqliteFetcher,
+}
+
+
+def get_fetcher(name):
+    """
+    Get fetcher by name, falls back to pandas fetcher if Arrow dependencies are not installed
+
+    :param str name: Name of fetcher ('pandas', 'arrow' or 'sqlite')
+
+    :return: Fetcher
+    :rtype: Fetcher
+    """
+
+    if name not in fetchers:
+        raise ValueError(f'Unknown fetcher: {name}, should be one of {", ".join(fetchers)}')
+
+    if name == ArrowOdbcFetcher.name:
+        try:
+            return ArrowOdbcFetcher(batch_size=fetch_batch_size)
+        except (ImportError, OSError) as e:
+            print(f'{Fore.YELLOW}Arrow fetcher not available ({e}), using pandas fetcher.{Style.RESET_ALL}')
+            return PandasFetcher()
+
+    return fetchers[name]()
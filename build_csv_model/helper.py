@@ -1,5 +1,10 @@
+from concurrent.futures import ProcessPoolExecutor
 from colorama import Fore, Style
 from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import tempfile
+import json
 import os
 
 from .database import get_db_engine
@@ -79,6 +84,130 @@ def val_range(t):
     return start, end
 
 
+def calc_buckets(timestamps, base):
+    """Calculate the timestep bucket of each timestamp, bucket n holds (base + 10 min * (n - 1), base + 10 min * n]
+
+    :param series timestamps: Series of timestamps
+    :param datetime base: Timestep of the first bucket
+
+    :return: Bucket of each timestamp
+    :rtype: series
+    """
+
+    return np.ceil((timestamps - base) / timedelta(minutes=10)).astype('int64')
+
+
+def resolve_tag_values(rows):
+    """Resolve value of each (timestep, tag) from its aggregates the way SubsetClass.fill_model_df_row does
+
+    Values are read in query order: any '1' gives 1 and each '0' restarts the sum of float values. The sum after the
+    last '0' gives 0 if no floats follow it, is kept if exactly 0 or 1 and is otherwise divided by the count of all
+    values. Only a 1 from a '1' or a 0 from a '0' is boolean.
+
+    :param dataframe rows: Rows with value_count, any_true, tail_sum (sum of floats after last '0') and tail_count
+
+    :return: Rows with value and is_flag added
+    :rtype: dataframe
+    """
+
+    any_true = rows['any_true'].astype(bool)
+    tail_count = rows['tail_count'].astype('int64')
+    tail_sum = rows['tail_sum'].astype('float64').fillna(0.0)
+
+    value = tail_sum.where(tail_sum.isin([0.0, 1.0]), tail_sum / rows['value_count'])
+    value = value.where(tail_count > 0, 0.0)
+
+    rows['value'] = value.where(~any_true, 1.0)
+    rows['is_flag'] = any_true | (tail_count == 0)
+
+    return rows
+
+
+def format_model_block(block, flag_columns):
+    """Format block of numeric model rows for output ('.5g' for values, integers for boolean tags)
+
+    Values of float tags that are exactly 0 or 1 are written as '0.0' and '1.0', as float sums of exactly 0 or 1
+    were always written. np.char.mod applies printf-style formatting to each element in turn, holding the GIL.
+
+    :param dataframe block: Block of rows of model dataframe
+    :param set flag_columns: Columns holding boolean values
+
+    :return: Block of formatted strings, empty where no value
+    :rtype: dataframe
+    """
+
+    formatted = {}
+    for col in block.columns:
+        values = block[col].to_numpy(dtype='float64', na_value=np.nan)
+        if col in flag_columns:
+            text = np.char.mod('%.0f', values).astype(object)
+        else:
+            text = np.char.mod('%.5g', values).astype(object)
+            text[values == 0] = '0.0'
+            text[values == 1] = '1.0'
+        text[np.isnan(values)] = ''
+        formatted[col] = text
+
+    return pd.DataFrame(formatted, index=block.index, columns=block.columns)
+
+
+def write_model_csv(model_df, path, flag_columns, chunk_rows=1000, chunk_columns=500, workers=1):
+    """Write numeric model to csv, formatting blocks of rows and columns in worker processes
+
+    Models have few rows (one per timestep), so wide models are split into blocks of columns. As formatting holds
+    the GIL, blocks are formatted in processes when workers is above 1.
+
+    :param dataframe model_df: Dataframe for model
+    :param str path: Output file path for model
+    :param set flag_columns: Columns holding boolean values
+    :param int chunk_rows: Number of rows per block
+    :param int chunk_columns: Number of columns per block
+    :param int workers: Number of processes formatting blocks (1 formats in this process)
+    """
+
+    row_starts = range(0, len(model_df), chunk_rows)
+    column_starts = range(0, len(model_df.columns), chunk_columns) or [0]
+
+    blocks = [model_df.iloc[r:r + chunk_rows, c:c + chunk_columns] for r in row_starts for c in column_starts]
+    block_flags = [set(block.columns) & set(flag_columns) for block in blocks]
+
+    with open(path, 'w', newline='') as f:
+        # header only, in case model has no rows
+        if not blocks:
+            model_df.to_csv(f)
+            return
+
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                formatted = list(executor.map(format_model_block, blocks, block_flags))
+        else:
+            formatted = list(map(format_model_block, blocks, block_flags))
+
+        # join column blocks of each row block, write row blocks in order
+        for x in range(0, len(formatted), len(column_starts)):
+            pd.concat(formatted[x:x + len(column_starts)], axis=1).to_csv(f, header=x == 0)
+
+
+
+def write_json_file(path, data):
+    """Write data to json file, replacing it at once so readers never see a partial file
+
+    :param str path: Path of json file
+    :param data: Data to write
+    """
+
+    # unique temporary file, other processes may write the same file at the same time
+    fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                    suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_file, path)
+    except BaseException:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+        raise
+
 def calc_incs(_span):
     """Calculate the increments needed for timesteps within table
 
@@ -0,0 +1,193 @@
+from collections import Counter
+from threading import Thread, Event, get_ident
+import tracemalloc
+import time
+import sys
+import os
+
+# phases a sample is attributed to, matched from the innermost frame outwards
+phase_rules = [
+    ('write', ('create_model_csv', 'write_model_csv', 'format_model_block', 'create_query_csv')),
+    ('fetch', ('sqlalchemy', 'pyodbc', 'arrow_odbc', 'adbc_driver', 'sqlite3')),
+    ('aggregation', ('fill_model_df_row', 'build_model_df', 'set_model_df_at_time_step')),
+    ('subset slicing', ('SubsetClass.py:__init__', 'create_subset_list')),
+    ('decode', ('pandas/io/sql', 'pandas\\io\\sql', 'read_page', 'create_query_df')),
+]
+
+# innermost frames of threads that are waiting rather than working
+idle_files = ('threading.py', 'queue.py', 'selectors.py', 'socketserver.py')
+
+
+def frame_name(frame):
+    """Get name of frame for collapsed stacks
+
+    :param frame frame: Stack frame
+
+    :return: Name as 'file:Class.function'
+    :rtype: str
+    """
+
+    code = frame.f_code
+    name = getattr(code, 'co_qualname', code.co_name)
+
+    # collapsed stack format separates frames with ';' and count with ' '
+    return f'{os.path.basename(code.co_filename)}:{name}'.replace(' ', '_').replace(';', '_')
+
+
+def classify_stack(frames):
+    """Attribute stack to phase of model build
+
+    :param list frames: Stack frames, innermost first
+
+    :return: Name of phase
+    :rtype: str
+    """
+
+    if frames and os.path.basename(frames[0].f_code.co_filename) in idle_files:
+        return 'idle'
+
+    for frame in frames:
+        code = frame.f_code
+        where = f'{code.co_filename}:{code.co_name}'
+        for phase, patterns in phase_rules:
+            if any(pattern in where for pattern in patterns):
+                return phase
+
+    return 'other'
+
+
+class RunProfiler(object):
+    """
+    Class that samples stacks of all threads and memory allocations during a model build
+    """
+    def __init__(self, interval=0.005, memory=True, memory_frames=10, top=25):
+        """
+        Constructor for RunProfiler
+
+        :param float interval: Seconds between stack samples
+        :param bool memory: Trace memory allocations with tracemalloc
+        :param int memory_frames: Number of frames stored per allocation
+        :param int top: Number of entries in report tables
+        """
+
+        self.interval = interval
+        self.memory = memory
+        self.memory_frames = memory_frames
+        self.top = top
+        self.stacks = Counter()
+        self.phases = Counter()
+        self.functions = Counter()
+        self.samples = 0
+        self.snapshot = None
+        self.peak_memory = 0
+        self.start_time = 0.0
+        self.end_time = 0.0
+        self.notes = []
+        self.stop_event = Event()
+        self.thread = Thread(target=self.sample, daemon=True)
+
+    def add_note(self, note):
+        """
+        Add note to report, e.g. on settings changed while profiling
+
+        :param str note: Note
+        """
+
+        self.notes.append(note)
+
+    def start(self):
+        """
+        Start sampling
+        """
+
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(self.memory_frames)
+
+        self.start_time = time.time()
+        self.thread.start()
+
+    def stop(self):
+        """
+        Stop sampling
+        """
+
+        self.stop_event.set()
+        self.thread.join()
+        self.end_time = time.time()
+
+        if self.memory and tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot()
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    def sample(self):
+        """
+        Sample stacks of all other threads until stopped
+        """
+
+        own_id = get_ident()
+
+        while not self.stop_event.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+
+                frames = []
+                while frame is not None:
+                    frames.append(frame)
+                    frame = frame.f_back
+
+                phase = classify_stack(frames)
+                self.phases[phase] += 1
+                self.samples += 1
+
+                if phase == 'idle':
+                    continue
+
+                names = [frame_name(f) for f in reversed(frames)]
+                self.stacks[f'{phase};' + ';'.join(names)] += 1
+                self.functions[names[-1]] += 1
+
+    def write_report(self, path):
+        """
+        Write report and collapsed stacks (flamegraph.pl / speedscope compatible)
+
+        :param str path: Output file path without extension
+
+        :return: Output file paths of report and collapsed stacks
+        :rtype: tuple
+        """
+
+        report_file = f'{path}.profile.txt'
+        collapsed_file = f'{path}.collapsed'
+
+        busy = sum(count for phase, count in self.phases.items() if phase != 'idle') or 1
+
+        lines = [f'Wall time: {self.end_time - self.start_time:.3f} seconds',
+                 f'Samples: {self.samples} every {self.interval * 1000:.1f} ms across all threads',
+                 '']
+        if self.notes:
+            lines += ['Notes:'] + [f'\t{note}' for note in self.notes] + ['']
+        lines += ['Time per phase (busy thread samples):']
+        for phase, count in self.phases.most_common():
+            if phase != 'idle':
+                lines.append(f'\t{phase:<16}{count * self.interval:>10.3f} s{100 * count / busy:>8.1f}%')
+
+        lines += ['', f'Hottest functions (top {self.top}):']
+        for name, count in self.functions.most_common(self.top):
+            lines.append(f'\t{count * self.interval:>10.3f} s  {name}')
+
+        if self.snapshot is not None:
+            lines += ['', f'Peak traced memory: {self.peak_memory / (1024 * 1024):.1f} MiB',
+                      f'Largest allocations still held (top {self.top}):']
+            for stat in self.snapshot.statistics('lineno')[:self.top]:
+                lines.append(f'\t{stat.size / 1024:>10.1f} KiB {stat.count:>8} blocks  {stat.traceback}')
+
+        with open(report_file, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+        with open(collapsed_file, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+        return report_file, collapsed_file
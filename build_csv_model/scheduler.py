@@ -0,0 +1,232 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from colorama import Fore, Style
+from threading import Lock, Semaphore
+import argparse
+import hashlib
+import json
+import time
+import os
+
+from .ModelClass import ModelClass
+from .backends import get_backend
+from .database import create_db_engine
+from .helper import test_date_and_time, convert_date, convert_time, check_dir, default_model, default_query
+from .config import column_index, column_name, _time_span, backend as _backend
+from .config import scheduler_max_connections, scheduler_max_workers
+
+
+def read_jobs(job_file):
+    """Read jobs from job file
+
+    Job file is JSON, a list of jobs (or {"jobs": [...]}) with keys: table, datetime ('YYYY-MM-DD HH:MM:SS')
+    or sample_date and sample_time, time_span, model_path, query_path, priority (higher first),
+    deadline ('YYYY-MM-DD HH:MM:SS') and an optional id
+
+    :param str job_file: Path of job file
+
+    :return: List of jobs
+    :rtype: list
+    """
+
+    with open(job_file, 'r') as f:
+        jobs = json.load(f)
+
+    if isinstance(jobs, dict):
+        jobs = jobs['jobs']
+
+    for job in jobs:
+        if 'datetime' in job:
+            job['sample_date'], job['sample_time'] = job['datetime'].split(' ')
+        job.setdefault('time_span', _time_span)
+        job.setdefault('priority', 0)
+        job.setdefault('deadline', None)
+
+        test_date_and_time(job['sample_date'], job['sample_time'])
+
+        if 'id' not in job:
+            raw = '|'.join(str(job.get(k)) for k in ('table', 'sample_date', 'sample_time', 'time_span',
+                                                     'model_path', 'query_path'))
+            job['id'] = hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+        if job['deadline'] is not None:
+            try:
+                job['deadline'] = datetime.strptime(job['deadline'], '%Y-%m-%d %H:%M:%S')
+            except (TypeError, ValueError):
+                raise ValueError(f'Deadline of job {job["id"]} should be YYYY-MM-DD HH:MM:SS, '
+                                 f'not {job["deadline"]}')
+
+    return jobs
+
+
+def order_jobs(jobs):
+    """Order jobs by priority (highest first), then deadline (earliest first)
+
+    :param list jobs: List of jobs
+
+    :return: Ordered list of jobs
+    :rtype: list
+    """
+
+    return sorted(jobs, key=lambda job: (-job['priority'], job['deadline'] is None, job['deadline'] or datetime.max))
+
+
+class JobState(object):
+    """
+    Class that stores state of jobs in a file so a rerun skips completed jobs
+    """
+    def __init__(self, state_file):
+        """
+        Constructor for JobState
+
+        :param str state_file: Path of state file
+        """
+
+        self.state_file = state_file
+        self.lock = Lock()
+        self.state = {}
+
+        if os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                self.state = json.load(f)
+
+    def is_done(self, job_id):
+        """
+        Check if job completed in a previous or current run
+
+        :param str job_id: Id of job
+
+        :return: T/F if job is completed
+        :rtype: bool
+        """
+
+        return self.state.get(job_id, {}).get('status') == 'done'
+
+    def set(self, job_id, **entry):
+        """
+        Set state of job and write state file
+
+        :param str job_id: Id of job
+        :param entry: State of job
+        """
+
+        with self.lock:
+            self.state[job_id] = dict(entry, updated=str(datetime.now()))
+
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w') as f:
+                json.dump(self.state, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+
+
+def run_jobs(job_file, state_file=None, max_connections=scheduler_max_connections,
+             max_workers=scheduler_max_workers, backend=_backend, engine=None):
+    """Run jobs of job file under a global budget of database connections and workers
+
+    :param str job_file: Path of job file
+    :param str state_file: Path of state file (None uses job file with '.state.json')
+    :param int max_connections: Maximum number of concurrent database connections
+    :param int max_workers: Maximum number of jobs built concurrently
+    :param str backend: Aggregation backend for models ('pandas' or 'duckdb')
+    :param engine: SQLAlchemy engine to query (None creates engine from config.py with max_connections pooled)
+
+    :return: State of jobs
+    :rtype: dict
+    """
+
+    jobs = order_jobs(read_jobs(job_file))
+    state = JobState(state_file or os.path.splitext(job_file)[0] + '.state.json')
+    aggregation_backend = get_backend(backend)
+
+    # one pooled connection per fetch slot
+    own_engine = engine is None
+    if own_engine:
+        engine = create_db_engine(pool_size=max_connections)
+    fetch_slots = Semaphore(max_connections)
+
+    # output names are incremented, so only one job may claim a name at a time
+    output_lock = Lock()
+
+    home = os.path.expanduser('~')
+    default_m = None
+    default_q = None
+    if any('model_path' not in job for job in jobs):
+        default_m = default_model(home)
+    if any('query_path' not in job for job in jobs):
+        default_q = default_query(home)
+
+    def run_job(job):
+        """Build model of one job
+
+        :param dict job: Job to run
+        """
+
+        if job['deadline'] is not None and datetime.now() > job['deadline']:
+            print(f'{Fore.YELLOW}Job {job["id"]} started after its deadline {job["deadline"]}{Style.RESET_ALL}')
+
+        start_time = time.time()
+        model_path = job.get('model_path', default_m)
+        query_path = job.get('query_path', default_q)
+
+        try:
+            # the check takes a pooled connection too, so it waits for a fetch slot like the query
+            with fetch_slots:
+                conn_c = engine.connect()
+                try:
+                    if not engine.dialect.has_table(conn_c, job['table']):
+                        raise ValueError(f'The table, {job["table"]}, does not exist!')
+                finally:
+                    conn_c.close()
+
+            _dt = datetime.combine(convert_date(job['sample_date']), convert_time(job['sample_time']))
+            model = ModelClass(date_time=_dt, time_span=job['time_span'], table=job['table'],
+                               column_index=column_index, column_name=job.get('tag_name', column_name),
+                               engine=engine)
+
+            with output_lock:
+                check_dir(model_path, True, 'model')
+                check_dir(query_path, True, 'query')
+                model.set_model_output(model_path, include_table=True)
+                model.set_query_output(query_path, include_table=True)
+                open(model.get_model_output(), 'w').close()
+                open(model.get_query_output(), 'w').close()
+
+            # claimed output files are removed if the build fails
+            model.build(aggregation_backend, fetch_slot=fetch_slots)
+
+            state.set(job['id'], status='done', model=model.get_model_output(), query=model.get_query_output(),
+                      seconds=time.time() - start_time)
+
+            print(f'{Fore.LIGHTGREEN_EX}Job {job["id"]} done: {Fore.YELLOW}{model.get_model_output()}'
+                  f'{Style.RESET_ALL}')
+        except Exception as e:
+            state.set(job['id'], status='failed', error=str(e), seconds=time.time() - start_time)
+            print(f'{Fore.RED}Job {job["id"]} failed: {Fore.LIGHTRED_EX}{e}{Style.RESET_ALL}')
+
+    pending = [job for job in jobs if not state.is_done(job['id'])]
+
+    print(f'{Fore.GREEN}Running {Fore.LIGHTWHITE_EX}{len(pending)}{Fore.GREEN} of {Fore.LIGHTWHITE_EX}{len(jobs)}'
+          f'{Fore.GREEN} jobs ({max_workers} workers, {max_connections} connections){Style.RESET_ALL}')
+
+    # jobs are queued in priority order and taken by workers as they become free
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(run_job, pending))
+
+    if own_engine:
+        engine.dispose()
+
+    return state.state
+
+
+# MAIN
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build CSV models listed in a job file')
+    parser.add_argument('job_file')
+    parser.add_argument('--state-file', default=None)
+    parser.add_argument('--max-connections', type=int, default=scheduler_max_connections)
+    parser.add_argument('--max-workers', type=int, default=scheduler_max_workers)
+    parser.add_argument('--backend', default=_backend)
+    args = parser.parse_args()
+
+    run_jobs(args.job_file, state_file=args.state_file, max_connections=args.max_connections,
+             max_workers=args.max_workers, backend=args.backend)
@@ -0,0 +1,299 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from colorama import Fore, Style
+from threading import Lock
+import argparse
+import json
+import time
+import os
+
+from .ModelClass import ModelClass
+from .backends import get_backend
+from .database import get_db_engine
+from .helper import test_date_and_time, convert_date, convert_time, check_dir, default_model, default_query
+from .config import column_index, column_name, _time_span, backend as _backend, service_max_windows
+
+
+class ModelService(object):
+    """
+    Class that keeps engine, tag catalog and recently fetched data warm to build models on request
+    """
+    def __init__(self, model_path, query_path, engine=None, backend=_backend, max_windows=service_max_windows):
+        """
+        Constructor for ModelService
+
+        :param str model_path: Output directory for CSV models
+        :param str query_path: Output directory for CSV queries
+        :param engine: SQLAlchemy engine to query (None uses engine from config.py)
+        :param str backend: Aggregation backend for models ('pandas' or 'duckdb')
+        :param int max_windows: Maximum number of fetched windows kept warm
+        """
+
+        self.model_path = model_path
+        self.query_path = query_path
+        self.engine = engine if engine is not None else get_db_engine()
+        self.backend = get_backend(backend)
+        self.max_windows = max_windows
+        self.tables = set()
+        self.tag_catalog = {}
+        self.windows = OrderedDict()
+        self.inflight = {}
+        self.lock = Lock()
+
+        check_dir(self.model_path, True, 'model')
+        check_dir(self.query_path, True, 'query')
+
+    def check_table(self, table):
+        """
+        Check table exists, only asking the database the first time a table is seen
+
+        :param str table: Name of table in database
+        """
+
+        if table in self.tables:
+            return
+
+        conn_c = self.engine.connect()
+        try:
+            if not self.engine.dialect.has_table(conn_c, table):
+                raise ValueError(f'The table, {table}, does not exist!')
+        finally:
+            conn_c.close()
+
+        self.tables.add(table)
+
+    def get_tags(self, table):
+        """
+        Get tags seen so far for table
+
+        :param str table: Name of table in database
+
+        :return: List of tags
+        :rtype: list
+        """
+
+        return list(self.tag_catalog.get(table, {}))
+
+    def find_window(self, model, fingerprint):
+        """
+        Find warm or in-flight fetch covering timeframe of model, must be called holding lock
+
+        Warm windows whose rows within the timeframe no longer match the source are dropped.
+
+        :param ModelClass model: Model to fetch data for
+        :param tuple fingerprint: Source fingerprint of timeframe of model (max id, row count)
+
+        :return: Future of query dataframe covering timeframe or None
+        :rtype: Future
+        """
+
+        for key in list(self.windows) + list(self.inflight):
+            w_table, w_start, w_end = key
+            if w_table == model.table and w_start <= model._start and model._end <= w_end:
+                if key in self.inflight:
+                    return self.inflight[key]
+
+                if self.get_window_fingerprint(self.windows[key].result(), model) != fingerprint:
+                    # rows were added or removed since the window was fetched
+                    del self.windows[key]
+                    continue
+
+                self.windows.move_to_end(key)
+                return self.windows[key]
+
+        return None
+
+    @staticmethod
+    def get_window_fingerprint(query_df, model):
+        """
+        Get fingerprint of fetched rows within timeframe of model, comparable to ModelClass.get_source_fingerprint
+
+        :param dataframe query_df: Fetched query dataframe of warm window
+        :param ModelClass model: Model to fetch data for
+
+        :return: Max id and row count within timeframe
+        :rtype: tuple
+        """
+
+        ids = query_df.loc[(query_df[model.column_index] > model._start) &
+                           (query_df[model.column_index] <= model._end), 'id']
+
+        return (int(ids.max()) if len(ids) else None), len(ids)
+
+    def get_query_df(self, model):
+        """
+        Get query dataframe for model, coalescing identical and overlapping requests into one fetch
+
+        Only windows containing the timeframe of model are shared, partly overlapping windows are fetched again.
+
+        :param ModelClass model: Model to fetch data for
+
+        :return: Dataframe from query of SQL database within timeframe of model
+        :rtype: dataframe
+        """
+
+        key = (model.table, model._start, model._end)
+
+        # checked outside of lock, it is a query of its own
+        fingerprint = model.get_source_fingerprint()
+
+        with self.lock:
+            future = self.find_window(model, fingerprint)
+            owner = future is None
+            if owner:
+                future = Future()
+                self.inflight[key] = future
+
+        if owner:
+            try:
+                model.create_query_df()
+                if model.get_guery_df() is None:
+                    model.cleanup_spill()
+                    raise ValueError('Spill mode is not supported by the model service')
+                future.set_result(model.get_guery_df())
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self.lock:
+                    del self.inflight[key]
+                    if future.exception() is None:
+                        self.windows[key] = future
+                        while len(self.windows) > self.max_windows:
+                            self.windows.popitem(last=False)
+
+        query_df = future.result()
+
+        # keep catalog of tags seen per table
+        self.tag_catalog.setdefault(model.table, {}).update(dict.fromkeys(query_df[model.column_name].unique()))
+
+        if owner:
+            return query_df
+
+        return query_df[(query_df[model.column_index] > model._start) &
+                        (query_df[model.column_index] <= model._end)].copy()
+
+    def build(self, sample_date, sample_time, table, time_span=_time_span, tag_name=column_name):
+        """
+        Build CSV model
+
+        :param str sample_date: Date of sample YYYY-MM-DD
+        :param str sample_time: Time of sample HH:MM:SS
+        :param str table: Name of target table in database
+        :param float time_span: Length of time needed for data in hours
+        :param str tag_name: Column name for tags
+
+        :return: Output file path for model
+        :rtype: str
+        """
+
+        test_date_and_time(sample_date, sample_time)
+        self.check_table(table)
+
+        _dt = datetime.combine(convert_date(sample_date), convert_time(sample_time))
+
+        model = ModelClass(date_time=_dt, time_span=float(time_span), table=table, column_index=column_index,
+                           column_name=tag_name, engine=self.engine, use_summary=False)
+
+        model.set_query_df(self.get_query_df(model))
+
+        # output file names are incremented, so only one request may claim a name at a time
+        with self.lock:
+            model.set_model_output(self.model_path)
+            model.set_query_output(self.query_path)
+            open(model.get_model_output(), 'w').close()
+            open(model.get_query_output(), 'w').close()
+
+        model.build(self.backend, fetch=False)
+
+        return model.get_model_output()
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    """
+    Class that handles HTTP requests of model service
+    """
+    service = None
+
+    def send_json(self, status, body):
+        """
+        Send JSON response
+
+        :param int status: HTTP status code
+        :param dict body: Body of response
+        """
+
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        """
+        Handle GET requests for /model and /tags
+        """
+
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        try:
+            if url.path == '/model':
+                start_time = time.time()
+                model_file = self.service.build(**params)
+                self.send_json(200, {'model': model_file, 'elapsed': time.time() - start_time})
+            elif url.path == '/tags':
+                self.send_json(200, {'tags': self.service.get_tags(params['table'])})
+            else:
+                self.send_json(404, {'error': f'Unknown path: {url.path}'})
+        except (ValueError, TypeError, KeyError) as e:
+            self.send_json(400, {'error': str(e)})
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+
+
+def serve(host='127.0.0.1', port=8765, model_path=None, query_path=None, engine=None, backend=_backend):
+    """Run model service until interrupted
+
+    :param str host: Address to listen on
+    :param int port: Port to listen on
+    :param str model_path: Output directory for CSV models
+    :param str query_path: Output directory for CSV queries
+    :param engine: SQLAlchemy engine to query (None uses engine from config.py)
+    :param str backend: Aggregation backend for models ('pandas' or 'duckdb')
+    """
+
+    if model_path is None:
+        model_path = default_model(os.path.expanduser('~'))
+    if query_path is None:
+        query_path = default_query(os.path.expanduser('~'))
+
+    handler = type('Handler', (ModelRequestHandler,), {
+        'service': ModelService(model_path, query_path, engine=engine, backend=backend)})
+    server = ThreadingHTTPServer((host, port), handler)
+
+    print(f'{Fore.GREEN}Model service listening on {Fore.LIGHTWHITE_EX}http://{host}:{port}{Style.RESET_ALL}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+# MAIN
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Long-lived service building CSV models on request')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--model-path', default=None)
+    parser.add_argument('--query-path', default=None)
+    parser.add_argument('--backend', default=_backend)
+    args = parser.parse_args()
+
+    serve(host=args.host, port=args.port, model_path=args.model_path, query_path=args.query_path,
+          backend=args.backend)
@@ -0,0 +1,146 @@
+from colorama import Fore, Style
+import sqlalchemy as sa
+import shutil
+import tempfile
+import os
+
+from .helper import calc_buckets
+from .config import debug
+
+
+def get_arrow_schema(pyarrow, table):
+    """
+    Get Arrow schema of query columns, shared by all spilled chunks
+
+    :param pyarrow: Imported pyarrow module
+    :param table: SQLAlchemy table queried by model
+
+    :return: Arrow schema
+    """
+
+    fields = []
+    for column in table.columns:
+        if isinstance(column.type, sa.Integer):
+            arrow_type = pyarrow.int64()
+        elif isinstance(column.type, sa.DateTime):
+            arrow_type = pyarrow.timestamp('ns')
+        else:
+            arrow_type = pyarrow.string()
+
+        fields.append(pyarrow.field(column.name, arrow_type))
+
+    return pyarrow.schema(fields)
+
+
+class SpillStore(object):
+    """
+    Class that spills fetched query chunks to temporary Arrow IPC files partitioned by timestep bucket
+    """
+    def __init__(self, base, column_index, column_name, table, path=None):
+        """
+        Constructor for SpillStore
+
+        :param datetime base: Timestep of the first bucket
+        :param str column_index: Name of column to use as an index '_TIMESTAMP'
+        :param str column_name: Column name of tags in database
+        :param table: SQLAlchemy table queried by model, gives the schema of spilled chunks
+        :param str path: Parent directory of temporary files (None uses system temp directory)
+        """
+
+        import pyarrow
+
+        self.pa = pyarrow
+        # chunks inferring their own schema can't be concatenated when a nullable column changes dtype
+        self.schema = get_arrow_schema(pyarrow, table)
+        self.base = base
+        self.column_index = column_index
+        self.column_name = column_name
+        self.path = tempfile.mkdtemp(prefix='build_csv_model_', dir=path)
+        self.partitions = {}
+        self.tags = {}
+        self.chunks = 0
+
+        if debug:
+            print(f'{Fore.LIGHTYELLOW_EX}Spilling query chunks to: {self.path}{Style.RESET_ALL}')
+
+    def append(self, df):
+        """
+        Write chunk of query dataframe to partition files
+
+        :param dataframe df: Chunk of query dataframe
+        """
+
+        # keep tags in order of appearance
+        self.tags.update(dict.fromkeys(df[self.column_name].unique()))
+
+        buckets = calc_buckets(df[self.column_index], self.base)
+
+        for bucket, part_df in df.groupby(buckets.values):
+            part_dir = os.path.join(self.path, f'bucket_{bucket:06d}')
+            if not os.path.isdir(part_dir):
+                os.mkdir(part_dir)
+
+            part_file = os.path.join(part_dir, f'chunk_{self.chunks:06d}.arrow')
+            table = self.pa.Table.from_pandas(part_df, schema=self.schema, preserve_index=False)
+
+            with self.pa.OSFile(part_file, 'wb') as sink:
+                with self.pa.ipc.new_file(sink, self.schema) as writer:
+                    writer.write_table(table)
+
+            self.partitions.setdefault(int(bucket), []).append(part_file)
+
+        self.chunks += 1
+
+    def get_tags(self):
+        """
+        Get unique tags of spilled chunks
+
+        :return: Unique tags in order of appearance
+        :rtype: list
+        """
+
+        return list(self.tags)
+
+    def get_buckets(self):
+        """
+        Get buckets that have spilled partitions
+
+        :return: Sorted list of buckets
+        :rtype: list
+        """
+
+        return sorted(self.partitions)
+
+    def read_partition(self, bucket):
+        """
+        Read partition of bucket by memory-mapping its files
+
+        :param int bucket: Bucket of partition
+
+        :return: Query dataframe for bucket
+        :rtype: dataframe
+        """
+
+        # tables reference the mapped files until they are converted to pandas
+        tables = [self.pa.ipc.open_file(self.pa.memory_map(part_file, 'r')).read_all()
+                  for part_file in self.partitions[bucket]]
+
+        return self.pa.concat_tables(tables).to_pandas()
+
+    def iter_partitions(self):
+        """
+        Iterate over partitions one bucket at a time
+
+        :return: Generator of (bucket, query dataframe for bucket)
+        """
+
+        for bucket in self.get_buckets():
+            yield bucket, self.read_partition(bucket)
+
+    def cleanup(self):
+        """
+        Remove temporary files of spilled partitions
+        """
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        self.partitions = {}
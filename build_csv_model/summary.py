@@ -0,0 +1,269 @@
+from colorama import Fore, Style
+import pandas as pd
+import sqlalchemy as sa
+import argparse
+
+from .database import get_db_engine
+from .helper import resolve_tag_values
+from .config import _table, summary_batch_size
+
+
+def get_summary_tables(table, metadata=None):
+    """Get raw table, 10-minute summary table and high-water mark table of table
+
+    Summary rows hold per (bucket, _NAME) the count of values, whether any True was found and the sum and count of
+    float values after the last '0' in id order (see helper.resolve_tag_values). Bucket is the end of its 10-minute
+    interval (start, end].
+
+    :param str table: Name of raw table in database
+    :param metadata: SQLAlchemy metadata (None creates new metadata)
+
+    :return: Raw table, summary table, high-water mark table
+    :rtype: tuple
+    """
+
+    metadata = metadata if metadata is not None else sa.MetaData()
+
+    raw_table = sa.Table(table,
+                         metadata,
+                         sa.Column('id', sa.INTEGER),
+                         sa.Column('_NAME', sa.VARCHAR),
+                         sa.Column('_VALUE', sa.VARCHAR),
+                         sa.Column('_TIMESTAMP', sa.DATETIME))
+
+    summary_table = sa.Table(f'{table}_SUMMARY10',
+                             metadata,
+                             sa.Column('bucket', sa.DATETIME, primary_key=True),
+                             sa.Column('_NAME', sa.VARCHAR(255), primary_key=True),
+                             sa.Column('value_count', sa.INTEGER),
+                             sa.Column('any_true', sa.INTEGER),
+                             sa.Column('tail_sum', sa.FLOAT),
+                             sa.Column('tail_count', sa.INTEGER))
+
+    hwm_table = sa.Table(f'{table}_SUMMARY10_HWM',
+                         metadata,
+                         sa.Column('id', sa.INTEGER),
+                         sa.Column('_TIMESTAMP', sa.DATETIME))
+
+    return raw_table, summary_table, hwm_table
+
+
+def is_summary_table(table):
+    """Check if table is a summary or high-water mark table created by this module
+
+    :param str table: Name of table in database
+
+    :return: T/F if table is a summary table
+    :rtype: bool
+    """
+
+    return table.endswith('_SUMMARY10') or table.endswith('_SUMMARY10_HWM')
+
+
+def create_summary_table(engine, table):
+    """Create summary and high-water mark tables of table if they do not exist
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of raw table in database
+    """
+
+    _raw, summary_table, hwm_table = get_summary_tables(table)
+    summary_table.create(engine, checkfirst=True)
+    hwm_table.create(engine, checkfirst=True)
+
+
+def has_summary(engine, table):
+    """Check if summary of table exists
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of raw table in database
+
+    :return: T/F if summary exists
+    :rtype: bool
+    """
+
+    conn_c = engine.connect()
+    try:
+        return engine.dialect.has_table(conn_c, f'{table}_SUMMARY10_HWM')
+    finally:
+        conn_c.close()
+
+
+def get_high_water_mark(conn, hwm_table):
+    """Get high-water mark of summary
+
+    :param conn: SQLAlchemy connection
+    :param hwm_table: High-water mark table
+
+    :return: Last summarized id and latest summarized timestamp (None, None if empty)
+    :rtype: tuple
+    """
+
+    row = conn.execute(sa.select([hwm_table.c.id, hwm_table.c._TIMESTAMP])).fetchone()
+
+    return (row[0], row[1]) if row is not None else (None, None)
+
+
+def read_high_water_mark(engine, table):
+    """Read high-water mark of summary of table
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of raw table in database
+
+    :return: Last summarized id and latest summarized timestamp (None, None if empty)
+    :rtype: tuple
+    """
+
+    _raw, _summary, hwm_table = get_summary_tables(table)
+
+    conn_c = engine.connect()
+    try:
+        return get_high_water_mark(conn_c, hwm_table)
+    finally:
+        conn_c.close()
+
+
+def summarize_rows(df):
+    """Aggregate raw rows per (bucket, _NAME)
+
+    :param dataframe df: Raw rows with _NAME, _VALUE and _TIMESTAMP in id order
+
+    :return: Summary rows, has_zero marks rows whose raw rows held a '0'
+    :rtype: dataframe
+    """
+
+    values = df['_VALUE'].astype(str)
+    is_float = ~values.isin(['0', '1'])
+
+    # each raw row is a summary of one value, merged in id order
+    rows = pd.DataFrame({
+        'bucket': df['_TIMESTAMP'].dt.ceil('10min'),
+        '_NAME': df['_NAME'],
+        'value_count': 1,
+        'any_true': (values == '1').astype(int),
+        'tail_sum': values.where(is_float, '0').astype(float),
+        'tail_count': is_float.astype(int),
+        'has_zero': (values == '0').astype(int),
+    })
+
+    return merge_summary_rows(rows)
+
+
+def merge_summary_rows(rows):
+    """Merge summary rows of the same (bucket, _NAME), later rows summarize later raw rows
+
+    Float sums of rows before the last row with a '0' are dropped, as a '0' restarts the sum.
+
+    :param dataframe rows: Summary rows in raw row order, with has_zero
+
+    :return: Merged summary rows
+    :rtype: dataframe
+    """
+
+    keys = [rows['bucket'], rows['_NAME']]
+    order = rows.groupby(keys).cumcount()
+    last_zero = order.where(rows['has_zero'] > 0).groupby(keys).transform('max')
+    is_tail = order >= last_zero.fillna(-1)
+
+    rows = rows.assign(tail_sum=rows['tail_sum'].where(is_tail, 0.0),
+                       tail_count=rows['tail_count'].where(is_tail, 0))
+
+    return rows.groupby(['bucket', '_NAME'], as_index=False, sort=False).agg(
+        {'value_count': 'sum', 'any_true': 'max', 'tail_sum': 'sum', 'tail_count': 'sum', 'has_zero': 'max'})
+
+
+def refresh_summary(engine, table, batch_size=summary_batch_size):
+    """Incrementally add raw rows above high-water mark to summary of table
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of raw table in database
+    :param int batch_size: Number of raw rows summarized per transaction
+
+    :return: Number of raw rows summarized
+    :rtype: int
+    """
+
+    raw_table, summary_table, hwm_table = get_summary_tables(table)
+    create_summary_table(engine, table)
+
+    total = 0
+    while True:
+        with engine.begin() as conn:
+            hwm_id, hwm_ts = get_high_water_mark(conn, hwm_table)
+
+            sa_select = sa.select(
+                [raw_table],
+                whereclause=raw_table.c.id > hwm_id if hwm_id is not None else None,
+                order_by=raw_table.c.id,
+                limit=batch_size)
+            df = pd.read_sql(sa_select, conn)
+
+            if len(df) == 0:
+                break
+
+            new_rows = summarize_rows(df)
+            # a range of buckets keeps the statement at two parameters (IN would bind one per bucket), buckets
+            # in the range without new rows are read and written back unchanged
+            buckets = pd.DatetimeIndex(new_rows['bucket'])
+            in_batch = summary_table.c.bucket.between(buckets.min().to_pydatetime(), buckets.max().to_pydatetime())
+
+            # merge with rows already summarized for these buckets, their sums stand unless new rows hold a '0'
+            existing = pd.read_sql(sa.select([summary_table], whereclause=in_batch), conn)
+            parts = [existing.assign(has_zero=1), new_rows] if len(existing) else [new_rows]
+            merged = merge_summary_rows(pd.concat(parts, ignore_index=True))
+
+            conn.execute(summary_table.delete().where(in_batch))
+            conn.execute(summary_table.insert(), [
+                {'bucket': bucket.to_pydatetime(), '_NAME': name, 'value_count': int(value_count),
+                 'any_true': int(any_true), 'tail_sum': float(tail_sum), 'tail_count': int(tail_count)}
+                for bucket, name, value_count, any_true, tail_sum, tail_count
+                in merged[['bucket', '_NAME', 'value_count', 'any_true', 'tail_sum', 'tail_count']].itertuples(
+                    index=False)])
+
+            # move high-water mark
+            max_ts = df['_TIMESTAMP'].max().to_pydatetime()
+            if hwm_ts is not None and hwm_ts > max_ts:
+                max_ts = hwm_ts
+            conn.execute(hwm_table.delete())
+            conn.execute(hwm_table.insert(), [{'id': int(df['id'].max()), '_TIMESTAMP': max_ts}])
+
+        total += len(df)
+        print(f'{Fore.GREEN}Summarized {Fore.LIGHTWHITE_EX}{total}{Fore.GREEN} rows of {table}{Style.RESET_ALL}')
+
+        if len(df) < batch_size:
+            break
+
+    return total
+
+
+def read_summary(engine, table, first_bucket, last_bucket):
+    """Read summary of buckets and resolve values the way SubsetClass.fill_model_df_row does
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of raw table in database
+    :param datetime first_bucket: First bucket to read
+    :param datetime last_bucket: Last bucket to read
+
+    :return: Rows of bucket, _NAME, value and is_flag
+    :rtype: dataframe
+    """
+
+    _raw, summary_table, _hwm = get_summary_tables(table)
+
+    df = pd.read_sql(sa.select([summary_table], whereclause=sa.and_(summary_table.c.bucket >= first_bucket,
+                                                                   summary_table.c.bucket <= last_bucket)),
+                     engine)
+
+    df = resolve_tag_values(df)
+
+    return df[['bucket', '_NAME', 'value', 'is_flag']]
+
+
+# MAIN
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create and incrementally refresh 10-minute summary of a table')
+    parser.add_argument('--table', default=_table)
+    parser.add_argument('--batch-size', type=int, default=summary_batch_size)
+    args = parser.parse_args()
+
+    refresh_summary(get_db_engine(), args.table, batch_size=args.batch_size)
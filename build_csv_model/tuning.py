@@ -0,0 +1,131 @@
+from colorama import Fore, Style
+from threading import Lock
+import json
+import os
+
+from .helper import write_json_file
+from .config import debug
+
+# state file is shared by models built concurrently
+state_lock = Lock()
+
+
+class ChunkTuner(object):
+    """
+    Class that tunes fetch chunk size of a table from measured throughput, latency and memory
+    """
+    def __init__(self, table, state_file=None, initial=100000, minimum=10000, maximum=2000000, growth=2.0,
+                 min_gain=0.05, max_latency=30.0, max_chunk_bytes=256 * 1024 * 1024):
+        """
+        Constructor for ChunkTuner
+
+        :param str table: Name of table in database
+        :param str state_file: JSON file storing chosen chunk size per table (None for no state)
+        :param int initial: Chunk size used if table has no stored chunk size
+        :param int minimum: Smallest chunk size
+        :param int maximum: Largest chunk size
+        :param float growth: Factor chunk size grows or shrinks by
+        :param float min_gain: Relative gain of rows/sec needed to keep growing
+        :param float max_latency: Round-trip seconds per chunk before shrinking
+        :param int max_chunk_bytes: Memory per chunk in bytes before shrinking
+        """
+
+        self.table = table
+        self.state_file = state_file
+        self.minimum = minimum
+        self.maximum = maximum
+        self.growth = growth
+        self.min_gain = min_gain
+        self.max_latency = max_latency
+        self.max_chunk_bytes = max_chunk_bytes
+        self.chunk_size = self.read_state().get(self.table, initial)
+        self.chunk_size = min(max(self.chunk_size, self.minimum), self.maximum)
+        self.best_size = self.chunk_size
+        self.best_rate = 0.0
+        self.growing = True
+
+    def get_chunk_size(self):
+        """
+        Get chunk size for next fetch
+
+        :return: Number of rows to fetch
+        :rtype: int
+        """
+
+        return self.chunk_size
+
+    def record(self, rows, seconds, chunk_bytes):
+        """
+        Record measurement of a full chunk and adjust chunk size
+
+        :param int rows: Number of rows fetched
+        :param float seconds: Round-trip time of fetch in seconds
+        :param int chunk_bytes: Memory of fetched chunk in bytes
+
+        :return: Chunk size for next fetch
+        :rtype: int
+        """
+
+        rate = rows / max(seconds, 1e-6)
+
+        if seconds > self.max_latency or chunk_bytes > self.max_chunk_bytes:
+            # over a limit, shrink and stop growing
+            self.chunk_size = max(self.minimum, int(self.chunk_size / self.growth))
+            self.best_size = self.chunk_size
+            self.best_rate = 0.0
+            self.growing = False
+        elif rate > self.best_rate * (1 + self.min_gain):
+            # throughput still improving
+            self.best_rate = rate
+            self.best_size = self.chunk_size
+            if self.growing:
+                self.chunk_size = min(self.maximum, int(self.chunk_size * self.growth))
+        elif self.growing:
+            # throughput stopped improving, go back to best size
+            self.chunk_size = self.best_size
+            self.growing = False
+
+        if debug:
+            print(f'{Fore.LIGHTYELLOW_EX}Fetched {rows} rows in {seconds:.2f}s ({rate:.0f} rows/sec), '
+                  f'next chunk size: {self.chunk_size}{Style.RESET_ALL}')
+
+        return self.chunk_size
+
+    def read_state(self):
+        """
+        Read stored chunk sizes
+
+        :return: Chunk size per table
+        :rtype: dict
+        """
+
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return {}
+
+        try:
+            with open(self.state_file, 'r') as f:
+                return json.load(f)
+        except (ValueError, OSError):
+            return {}
+
+    def save(self):
+        """
+        Store chosen chunk size of table for next run
+        """
+
+        if self.state_file is None:
+            return
+
+        with state_lock:
+            # chunk size is only a hint for the next run, failing to store it never fails the build
+            try:
+                state = self.read_state()
+                state[self.table] = self.best_size
+
+                state_dir = os.path.dirname(self.state_file)
+                if state_dir:
+                    os.makedirs(state_dir, exist_ok=True)
+
+                write_json_file(self.state_file, state)
+            except OSError as e:
+                print(f'{Fore.YELLOW}Could not store chunk size of {self.table}: {e}{Style.RESET_ALL}')
@@ -14,6 +14,11 @@ setup(name='build_csv_model',
             'pyodbc',
             'sqlalchemy',
       ],
+      extras_require={
+            'duckdb': ['duckdb'],
+            'spill': ['pyarrow'],
+            'arrow': ['arrow-odbc', 'pyarrow'],
+      },
       classifiers=[
             'Environment :: Console',
             'Operating System :: Microsoft :: Windows',
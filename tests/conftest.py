@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta
+import importlib
+import random
+
+import pytest
+import sqlalchemy as sa
+
+from build_csv_model.ModelClass import ModelClass
+from build_csv_model.backends import get_backend
+from build_csv_model.fetchers import PandasFetcher
+
+# model of sample_time with time_span 1 covers timesteps 09:00 to 10:00 and rows in (08:50, 10:00]
+sample_time = datetime(2021, 1, 1, 10, 0, 0)
+
+# values drawn per tag, covering boolean, float and mixed tags
+tag_values = {
+    'FLAG': ['0', '0', '0', '1'],
+    'FLOAT': ['0.5', '2.5', '-1.5', '3.25'],
+    'MIXED': ['0', '1', '0.5', '2.5'],
+    'ZERO_FLOAT': ['0', '0', '0.5', '2.5', '0.0'],
+    'SUM_ONE': ['0.25', '0.75'],
+}
+
+
+def history_table(table, metadata=None):
+    """Get raw history table with columns queried by ModelClass
+
+    :param str table: Name of table
+    :param metadata: SQLAlchemy metadata (None creates new metadata)
+
+    :return: SQLAlchemy table
+    """
+
+    return sa.Table(table,
+                    metadata if metadata is not None else sa.MetaData(),
+                    sa.Column('id', sa.INTEGER, primary_key=True),
+                    sa.Column('_NAME', sa.VARCHAR),
+                    sa.Column('_NUMERICID', sa.INTEGER),
+                    sa.Column('_VALUE', sa.VARCHAR),
+                    sa.Column('_TIMESTAMP', sa.DATETIME),
+                    sa.Column('_QUALITY', sa.INTEGER))
+
+
+def make_rows(count, seed=0, first_id=1):
+    """Make random raw rows around window of sample_time, ids in insert order
+
+    :param int count: Number of rows
+    :param int seed: Seed of random values
+    :param int first_id: Id of first row
+
+    :return: List of rows
+    :rtype: list
+    """
+
+    rng = random.Random(seed)
+    tags = list(tag_values)
+    start = sample_time - timedelta(minutes=80)
+
+    rows = []
+    for x in range(count):
+        tag = rng.choice(tags)
+
+        # some rows exactly on timestep boundaries, some outside of window
+        if rng.random() < 0.1:
+            ts = sample_time - timedelta(minutes=10 * rng.randint(0, 8))
+        else:
+            ts = start + timedelta(seconds=rng.randint(0, 85 * 60), microseconds=rng.randint(0, 999) * 1000)
+
+        rows.append({'id': first_id + x, '_NAME': tag, '_NUMERICID': tags.index(tag) + 1,
+                     '_VALUE': rng.choice(tag_values[tag]), '_TIMESTAMP': ts, '_QUALITY': 192})
+
+    return rows
+
+
+def insert_rows(engine, table, rows):
+    """Insert raw rows into table, creating it if needed
+
+    :param engine: SQLAlchemy engine
+    :param str table: Name of table
+    :param list rows: Rows to insert
+    """
+
+    raw_table = history_table(table)
+    raw_table.create(engine, checkfirst=True)
+
+    with engine.begin() as conn:
+        conn.execute(raw_table.insert(), rows)
+
+
+@pytest.fixture(autouse=True)
+def no_chunk_state(monkeypatch):
+    """Keep chunk tuner from writing its state file into home directory"""
+
+    monkeypatch.setattr(importlib.import_module('build_csv_model.ModelClass'), 'chunk_autotune', False)
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """SQLite engine with table HIST of random raw rows"""
+
+    engine = sa.create_engine(f'sqlite:///{tmp_path / "history.db"}')
+    insert_rows(engine, 'HIST', make_rows(600))
+
+    yield engine
+
+    engine.dispose()
+
+
+@pytest.fixture
+def build_model(engine):
+    """Build model of a table in engine, returns the model"""
+
+    def build(table='HIST', backend='pandas', fetcher=None, use_summary=False, time_span=1.0):
+        model = ModelClass(date_time=sample_time, time_span=time_span, table=table, column_index='_TIMESTAMP',
+                           column_name='_NAME', engine=engine, fetcher=fetcher or PandasFetcher(),
+                           use_summary=use_summary)
+        model.create_query_df()
+        model.init_model_df()
+        model.build_model_df(get_backend(backend))
+
+        return model
+
+    return build
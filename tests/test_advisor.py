@@ -0,0 +1,50 @@
+from build_csv_model.ModelClass import ModelClass
+from build_csv_model.advisor import get_index_report, find_covering_index, print_index_report
+from build_csv_model.fetchers import PandasFetcher
+
+from .conftest import sample_time
+
+
+def make_model(engine):
+    return ModelClass(date_time=sample_time, time_span=1.0, table='HIST', column_index='_TIMESTAMP',
+                      column_name='_NAME', engine=engine, fetcher=PandasFetcher(), use_summary=False)
+
+
+def test_missing_covering_index(engine):
+    report = get_index_report(make_model(engine))
+
+    assert report['covering_index'] is None
+    assert not report['covering_index_used']
+    assert not report['seek']
+    assert report['include_columns'] == ['id', '_NUMERICID', '_VALUE', '_QUALITY']
+    assert report['ddl'] == ('CREATE INDEX "IX_HIST_TIMESTAMP_NAME" ON "HIST" '
+                             '("_TIMESTAMP", "_NAME", id, "_NUMERICID", "_VALUE", "_QUALITY")')
+
+    print_index_report(report, ddl=True)
+
+
+def test_covering_index_is_used(engine):
+    with engine.begin() as conn:
+        conn.execute(get_index_report(make_model(engine))['ddl'])
+
+    report = get_index_report(make_model(engine))
+
+    assert report['covering_index'] == 'IX_HIST_TIMESTAMP_NAME'
+    assert report['covering_index_used']
+    assert report['seek']
+    assert report['ddl'] is None
+
+
+def test_find_covering_index():
+    indexes = [{'name': 'IX_NAME', 'column_names': ['_NAME', '_TIMESTAMP']},
+               {'name': 'IX_KEY', 'column_names': ['_TIMESTAMP', '_NAME']},
+               {'name': 'IX_COVER', 'column_names': ['_TIMESTAMP', '_NAME'],
+                'dialect_options': {'mssql_include': ['_VALUE']}},
+               {'name': 'IX_FULL', 'column_names': ['_TIMESTAMP', '_NAME'],
+                'dialect_options': {'mssql_include': ['id', '_NUMERICID', '_VALUE', '_QUALITY']}}]
+    include_columns = ['id', '_NUMERICID', '_VALUE', '_QUALITY']
+
+    # an index including only _VALUE doesn't cover the other selected columns
+    assert find_covering_index(indexes, include_columns)['name'] == 'IX_FULL'
+    assert find_covering_index(indexes[:3], include_columns) is None
+    assert find_covering_index(indexes[:3], ['_VALUE'])['name'] == 'IX_COVER'
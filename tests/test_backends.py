@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+from .conftest import sample_time, insert_rows
+
+pytest.importorskip('duckdb')
+
+
+def test_duckdb_matches_pandas(build_model):
+    pandas_model = build_model(backend='pandas')
+    duckdb_model = build_model(backend='duckdb')
+
+    pd.testing.assert_frame_equal(duckdb_model.get_model_df(), pandas_model.get_model_df())
+    assert duckdb_model.get_flag_columns() == pandas_model.get_flag_columns()
+
+
+def test_duckdb_matches_pandas_mixed_tag(engine, build_model):
+    step = sample_time - timedelta(minutes=5)
+    values = [('MIXED_ORDER', '2.5'), ('MIXED_ORDER', '0'), ('MIXED_ORDER', '0.5'), ('MIXED_ORDER', '2.5'),
+              ('RESET', '0.5'), ('RESET', '0'), ('EXACT_ONE', '0.25'), ('EXACT_ONE', '0.75')]
+    insert_rows(engine, 'HIST', [
+        {'id': 1000 + x, '_NAME': tag, '_NUMERICID': 100, '_VALUE': value,
+         '_TIMESTAMP': step + timedelta(seconds=x), '_QUALITY': 192}
+        for x, (tag, value) in enumerate(values)])
+
+    for backend in ('pandas', 'duckdb'):
+        model = build_model(backend=backend)
+        row = model.get_model_df().loc[sample_time]
+
+        # floats after the last '0' are summed and divided by the count of all values
+        assert row['MIXED_ORDER'] == pytest.approx(0.75)
+        # a '0' with no floats after it resolves to boolean 0
+        assert row['RESET'] == 0 and 'RESET' in model.get_flag_columns()
+        # a float sum of exactly 1 is kept, not averaged
+        assert row['EXACT_ONE'] == 1.0 and 'EXACT_ONE' not in model.get_flag_columns()
+
+
+
+@pytest.mark.parametrize('table', ['EMPTY', 'HIST'])
+def test_duckdb_empty_window(engine, build_model, table):
+    from build_csv_model.summary import refresh_summary
+
+    if table == 'EMPTY':
+        # only rows long before the window
+        insert_rows(engine, table, [
+            {'id': 1, '_NAME': 'OLD', '_NUMERICID': 1, '_VALUE': '0.5',
+             '_TIMESTAMP': sample_time - timedelta(days=1), '_QUALITY': 192}])
+    else:
+        # summary covers every timestep, so no raw rows are queried
+        refresh_summary(engine, table)
+
+    pandas_model = build_model(table=table, backend='pandas', use_summary=True)
+    duckdb_model = build_model(table=table, backend='duckdb', use_summary=True)
+
+    assert len(duckdb_model.get_guery_df()) == 0
+    pd.testing.assert_frame_equal(duckdb_model.get_model_df(), pandas_model.get_model_df())
@@ -0,0 +1,70 @@
+from datetime import datetime
+from types import SimpleNamespace
+import importlib
+import itertools
+import os
+
+import pytest
+
+from build_csv_model.cache import ModelCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Make every access of the cache one second later than the previous one"""
+
+    ticks = itertools.count(1)
+    monkeypatch.setattr(importlib.import_module('build_csv_model.cache'), 'time',
+                        SimpleNamespace(time=lambda: float(next(ticks))))
+
+
+def put_model(cache, tmp_path, key, size=10):
+    model_file = tmp_path / f'{key}_model.csv'
+    model_file.write_text('x' * size)
+
+    return cache.put(key, str(model_file))
+
+
+def test_key_depends_on_backend():
+    args = ('HIST', datetime(2021, 1, 1, 10, 0, 0), 1.0, '_NAME')
+
+    assert ModelCache.make_key(*args, 'pandas', (10, 5)) != ModelCache.make_key(*args, 'duckdb', (10, 5))
+    assert ModelCache.make_key(*args, 'pandas', (10, 5)) == ModelCache.make_key(*args, 'pandas', (10, 5))
+
+
+def test_put_and_get(tmp_path):
+    cache = ModelCache(path=str(tmp_path / 'cache'), max_entries=2, max_bytes=1024 * 1024)
+    model_file = tmp_path / 'model.csv'
+    model_file.write_text('_TIMESTAMP,A\n')
+
+    cache.put('key', str(model_file))
+
+    assert cache.get('key') is not None
+    assert cache.get('missing') is None
+
+
+def test_evicts_least_recently_used(tmp_path, clock):
+    cache = ModelCache(path=str(tmp_path / 'cache'), max_entries=2, max_bytes=1024 * 1024)
+    first = put_model(cache, tmp_path, 'first')
+    second = put_model(cache, tmp_path, 'second')
+
+    # reading first makes second the least recently used
+    assert cache.get('first') == first
+    put_model(cache, tmp_path, 'third')
+
+    assert cache.get('second') is None and not os.path.exists(second)
+    assert cache.get('first') == first and cache.get('third') is not None
+
+
+def test_evicts_until_within_size(tmp_path, clock):
+    cache = ModelCache(path=str(tmp_path / 'cache'), max_entries=10, max_bytes=25)
+    first = put_model(cache, tmp_path, 'first')
+    second = put_model(cache, tmp_path, 'second')
+
+    # 30 bytes over the limit of 25, only the oldest entry has to go
+    put_model(cache, tmp_path, 'third')
+
+    assert cache.get('first') is None and not os.path.exists(first)
+    assert cache.get('second') == second and cache.get('third') is not None
+    assert sorted(os.listdir(tmp_path / 'cache')) == sorted(['index.json', os.path.basename(second),
+                                                             os.path.basename(cache.get('third'))])
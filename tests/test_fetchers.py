@@ -0,0 +1,65 @@
+from datetime import timedelta
+import importlib
+
+import pandas as pd
+import pytest
+
+from build_csv_model.fetchers import ArrowOdbcFetcher, PandasFetcher, SqliteFetcher, get_fetcher
+
+from .conftest import sample_time
+
+
+class CountingFetcher(SqliteFetcher):
+    """
+    SQLite fetcher counting connections and pages
+    """
+    def __init__(self):
+        self.connections = 0
+        self.pages = 0
+
+    def connect(self, model):
+        self.connections += 1
+        return super().connect(model)
+
+    def read_page(self, model, offset, chunk_size, connection):
+        self.pages += 1
+        return super().read_page(model, offset, chunk_size, connection)
+
+
+def test_sqlite_fetcher_matches_pandas_fetcher(build_model):
+    pandas_model = build_model(fetcher=PandasFetcher())
+    sqlite_model = build_model(fetcher=SqliteFetcher())
+
+    pd.testing.assert_frame_equal(sqlite_model.get_guery_df().reset_index(drop=True),
+                                  pandas_model.get_guery_df().reset_index(drop=True), check_dtype=False)
+    pd.testing.assert_frame_equal(sqlite_model.get_model_df(), pandas_model.get_model_df())
+
+
+def test_pages_share_one_connection(monkeypatch, build_model):
+    monkeypatch.setattr(importlib.import_module('build_csv_model.ModelClass'), 'default_chunk_size', 64)
+    fetcher = CountingFetcher()
+
+    model = build_model(fetcher=fetcher)
+
+    assert fetcher.pages == len(model.get_guery_df()) // 64 + 1
+    assert fetcher.connections == 1
+
+
+def test_arrow_query_uses_model_select(build_model):
+    model = build_model()
+    model.query_start = sample_time - timedelta(minutes=30)
+
+    query, params = ArrowOdbcFetcher.get_query(model, 200, 100)
+
+    assert 'ORDER BY "HIST"."_NUMERICID"' in query
+    assert 'LIMIT 100 OFFSET 200' in query
+    # rows are read after query_start, which moves forward when timesteps are read from summary
+    assert params == ['2021-01-01T09:30:00.000', '2021-01-01T10:00:00.000']
+
+
+def test_get_fetcher():
+    assert isinstance(get_fetcher('sqlite'), SqliteFetcher)
+    assert isinstance(get_fetcher('arrow'), (ArrowOdbcFetcher, PandasFetcher))
+
+    with pytest.raises(ValueError):
+        get_fetcher('unknown')
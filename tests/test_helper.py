@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from build_csv_model.helper import write_model_csv, resolve_tag_values, format_model_block
+
+
+@pytest.fixture
+def model_df():
+    rng = np.random.default_rng(0)
+    index = pd.Index(pd.date_range('2021-01-01 09:00:00', periods=13, freq='10min'), name='_TIMESTAMP')
+    model_df = pd.DataFrame(rng.normal(size=(13, 1200)), index=index, columns=[f'T{x}' for x in range(1200)])
+    model_df.iloc[::3, ::7] = np.nan
+    model_df['FLAG'] = pd.array([0, 1, None] * 4 + [1], dtype='Int8')
+
+    return model_df
+
+
+@pytest.mark.parametrize('chunk_rows, chunk_columns, workers', [(1000, 500, 1), (5, 100, 1), (1000, 300, 2)])
+def test_write_model_csv_blocks(tmp_path, model_df, chunk_rows, chunk_columns, workers):
+    expected_file = tmp_path / 'expected.csv'
+    model_file = tmp_path / 'model.csv'
+
+    write_model_csv(model_df, str(expected_file), {'FLAG'}, chunk_rows=10 ** 6, chunk_columns=10 ** 6)
+    write_model_csv(model_df, str(model_file), {'FLAG'}, chunk_rows=chunk_rows, chunk_columns=chunk_columns,
+                    workers=workers)
+
+    assert model_file.read_text() == expected_file.read_text()
+
+    written = pd.read_csv(model_file, index_col=0)
+    assert list(written.columns) == list(model_df.columns)
+    assert written['FLAG'].isna().sum() == 4
+    assert written['T1'].to_numpy() == pytest.approx(model_df['T1'].to_numpy(), rel=1e-4)
+
+
+def test_resolve_tag_values():
+    rows = pd.DataFrame({'value_count': [4, 3, 2, 2, 1],
+                         'any_true': [False, True, False, False, False],
+                         'tail_sum': [3.0, 0.5, None, 1.0, 0.0],
+                         'tail_count': [2, 1, 0, 2, 1]})
+
+    rows = resolve_tag_values(rows)
+
+    assert list(rows['value']) == [0.75, 1.0, 0.0, 1.0, 0.0]
+    assert list(rows['is_flag']) == [False, True, True, False, False]
+
+
+def test_format_model_block():
+    block = pd.DataFrame({'FLOAT': [0.0, 1.0, 0.75, np.nan], 'FLAG': pd.array([0, 1, None, 1], dtype='Int8')})
+
+    formatted = format_model_block(block, {'FLAG'})
+
+    # float tags keep '0.0' and '1.0', boolean tags are integers
+    assert list(formatted['FLOAT']) == ['0.0', '1.0', '0.75', '']
+    assert list(formatted['FLAG']) == ['0', '1', '', '1']
@@ -0,0 +1,68 @@
+import importlib
+import os
+
+import pandas as pd
+import pytest
+
+from build_csv_model import create_models
+from build_csv_model.ModelClass import ModelClass
+from build_csv_model.backends import AggregationBackend
+from build_csv_model.fetchers import PandasFetcher
+from build_csv_model.summary import refresh_summary
+
+from .conftest import sample_time
+
+
+def test_failed_table_does_not_stop_others(tmp_path, engine):
+    with engine.begin() as conn:
+        conn.execute('CREATE TABLE BROKEN (x INTEGER)')
+
+    result = create_models('2021-01-01', '10:00:00', tables=['HIST', 'BROKEN'], time_span=1.0,
+                           model_path=str(tmp_path / 'models'), query_path=str(tmp_path / 'queries'),
+                           max_workers=2, engine=engine)
+
+    assert list(result) == ['HIST', 'BROKEN']
+    assert result['BROKEN'] is None
+    assert os.path.getsize(result['HIST']) > 0
+
+
+def test_pattern_skips_summary_tables(tmp_path, engine):
+    refresh_summary(engine, 'HIST')
+
+    result = create_models('2021-01-01', '10:00:00', table_pattern='HIST*', time_span=1.0,
+                           model_path=str(tmp_path / 'models'), query_path=str(tmp_path / 'queries'),
+                           combined=True, engine=engine)
+
+    model_df = pd.read_csv(result, index_col=0)
+    assert all(column.startswith('HIST.') for column in model_df.columns)
+
+
+class FailingBackend(AggregationBackend):
+    name = 'failing'
+
+    def build_model_df(self, model, time_steps=None):
+        raise RuntimeError('aggregation failed')
+
+
+def test_failed_build_removes_output_files(tmp_path, engine, monkeypatch):
+    # spill every chunk, so spill files exist when aggregation fails
+    model_module = importlib.import_module('build_csv_model.ModelClass')
+    monkeypatch.setattr(model_module, 'spill_memory_budget', 1)
+    monkeypatch.setattr(model_module, 'spill_dir', str(tmp_path))
+
+    for path in ('models', 'queries'):
+        (tmp_path / path).mkdir()
+
+    model = ModelClass(date_time=sample_time, time_span=1.0, table='HIST', column_index='_TIMESTAMP',
+                       column_name='_NAME', engine=engine, fetcher=PandasFetcher(), use_summary=False)
+    model.set_model_output(str(tmp_path / 'models'))
+    model.set_query_output(str(tmp_path / 'queries'))
+
+    with pytest.raises(RuntimeError):
+        model.build(FailingBackend())
+
+    # query csv was written before aggregation failed
+    assert os.listdir(tmp_path / 'queries') == []
+    assert os.listdir(tmp_path / 'models') == []
+    assert model.spill_store is None
+    assert sorted(os.listdir(tmp_path)) == ['history.db', 'models', 'queries']
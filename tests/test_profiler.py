@@ -0,0 +1,55 @@
+import os
+
+from build_csv_model.ModelClass import ModelClass
+from build_csv_model.backends import get_backend
+from build_csv_model.fetchers import PandasFetcher
+from build_csv_model.profiler import RunProfiler, classify_stack
+
+from .conftest import sample_time
+
+
+def test_profile_of_build(tmp_path, engine):
+    for path in ('models', 'queries'):
+        (tmp_path / path).mkdir()
+
+    model = ModelClass(date_time=sample_time, time_span=1.0, table='HIST', column_index='_TIMESTAMP',
+                       column_name='_NAME', engine=engine, fetcher=PandasFetcher(), use_summary=False)
+    model.set_model_output(str(tmp_path / 'models'))
+    model.set_query_output(str(tmp_path / 'queries'))
+
+    profiler = RunProfiler(interval=0.001, top=5)
+    profiler.add_note('csv_workers=4 ignored while profiling, csv formatted in this process')
+    profiler.start()
+    try:
+        model.build(get_backend('pandas'), workers=1)
+    finally:
+        profiler.stop()
+
+    report_file, collapsed_file = profiler.write_report(os.path.splitext(model.get_model_output())[0])
+
+    with open(report_file) as f:
+        report = f.read()
+
+    assert 'csv_workers=4 ignored while profiling' in report
+    assert 'Time per phase' in report and 'Hottest functions' in report and 'Peak traced memory' in report
+    # stacks were sampled in phases of the build
+    assert set(profiler.phases) & {'fetch', 'decode', 'aggregation', 'subset slicing', 'write'}
+    assert all(f'\t{phase:<16}' in report for phase in profiler.phases if phase != 'idle')
+
+    with open(collapsed_file) as f:
+        lines = f.read().splitlines()
+
+    assert lines
+    assert all(line.rsplit(' ', 1)[1].isdigit() for line in lines)
+
+
+def test_classify_stack():
+    def code_frame(filename, name):
+        code = compile('', filename, 'exec').replace(co_name=name)
+        return type('Frame', (), {'f_code': code})()
+
+    assert classify_stack([code_frame('/lib/threading.py', 'wait')]) == 'idle'
+    assert classify_stack([code_frame('/lib/sqlite3/dbapi2.py', 'execute'),
+                           code_frame('/pkg/ModelClass.py', 'create_query_df')]) == 'fetch'
+    assert classify_stack([code_frame('/pkg/helper.py', 'format_model_block')]) == 'write'
+    assert classify_stack([code_frame('/pkg/other.py', 'main')]) == 'other'
@@ -0,0 +1,92 @@
+import json
+import os
+import time
+
+import pytest
+import sqlalchemy as sa
+
+from build_csv_model.fetchers import PandasFetcher
+from build_csv_model.scheduler import read_jobs, order_jobs, run_jobs
+
+
+def write_jobs(tmp_path, jobs):
+    job_file = tmp_path / 'jobs.json'
+    job_file.write_text(json.dumps(jobs))
+
+    return str(job_file)
+
+
+def test_run_jobs(tmp_path, engine):
+    with engine.begin() as conn:
+        conn.execute('CREATE TABLE BROKEN (x INTEGER)')
+
+    model_path = tmp_path / 'models'
+    query_path = tmp_path / 'queries'
+    job_file = write_jobs(tmp_path, [
+        {'id': 'good', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'time_span': 1.0,
+         'model_path': str(model_path), 'query_path': str(query_path)},
+        {'id': 'broken', 'table': 'BROKEN', 'datetime': '2021-01-01 10:00:00', 'time_span': 1.0,
+         'model_path': str(model_path), 'query_path': str(query_path)},
+        {'id': 'missing', 'table': 'MISSING', 'datetime': '2021-01-01 10:00:00', 'time_span': 1.0,
+         'model_path': str(model_path), 'query_path': str(query_path)},
+    ])
+
+    state = run_jobs(job_file, engine=engine, max_connections=1, max_workers=2)
+
+    assert state['good']['status'] == 'done'
+    assert os.path.getsize(state['good']['model']) > 0
+    assert state['missing']['status'] == 'failed'
+    assert 'does not exist' in state['missing']['error']
+    assert state['broken']['status'] == 'failed'
+
+    # no placeholders of failed jobs are left behind
+    assert sorted(os.listdir(model_path)) == [os.path.basename(state['good']['model'])]
+    assert sorted(os.listdir(query_path)) == [os.path.basename(state['good']['query'])]
+
+    # rerun skips completed job
+    state = run_jobs(job_file, engine=engine)
+    assert len(os.listdir(model_path)) == 1
+    assert state['good']['status'] == 'done'
+
+
+def test_deadline_is_parsed_and_ordered(tmp_path):
+    jobs = read_jobs(write_jobs(tmp_path, [
+        {'id': 'late', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'deadline': '2021-06-01 12:30:00'},
+        {'id': 'none', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00'},
+        {'id': 'early', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'deadline': '2021-06-01 9:30:00'},
+        {'id': 'first', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'priority': 1},
+    ]))
+
+    assert [job['id'] for job in order_jobs(jobs)] == ['first', 'early', 'late', 'none']
+
+
+def test_invalid_deadline(tmp_path):
+    job_file = write_jobs(tmp_path, [
+        {'id': 'bad', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'deadline': 'tomorrow'}])
+
+    with pytest.raises(ValueError):
+        read_jobs(job_file)
+
+
+def test_more_workers_than_connections(tmp_path, engine, monkeypatch):
+    # pool of exactly max_connections, a job started while another one fetches must wait for a fetch slot before
+    # taking a connection, or it times out
+    pooled_engine = sa.create_engine(engine.url, poolclass=sa.pool.QueuePool, pool_size=1, max_overflow=0,
+                                     pool_timeout=0.2, connect_args={'check_same_thread': False})
+
+    read_page = PandasFetcher.read_page
+
+    def slow_read_page(self, model, offset, chunk_size, connection):
+        time.sleep(0.5)
+        return read_page(self, model, offset, chunk_size, connection)
+
+    monkeypatch.setattr(PandasFetcher, 'read_page', slow_read_page)
+
+    job_file = write_jobs(tmp_path, [
+        {'id': f'job{x}', 'table': 'HIST', 'datetime': '2021-01-01 10:00:00', 'time_span': 1.0,
+         'model_path': str(tmp_path / 'models'), 'query_path': str(tmp_path / 'queries')} for x in range(4)])
+
+    state = run_jobs(job_file, engine=pooled_engine, max_connections=1, max_workers=2)
+    pooled_engine.dispose()
+
+    assert [state[f'job{x}']['status'] for x in range(4)] == ['done'] * 4
@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import os
+
+import pandas as pd
+import pytest
+
+from build_csv_model.service import ModelService
+
+from .conftest import sample_time, insert_rows
+
+
+@pytest.fixture
+def service(tmp_path, engine):
+    return ModelService(str(tmp_path / 'models'), str(tmp_path / 'queries'), engine=engine)
+
+
+def test_build_matches_model(service, build_model):
+    model_file = service.build('2021-01-01', '10:00:00', 'HIST', time_span=1.0)
+
+    expected = build_model()
+    model_df = pd.read_csv(model_file, index_col=0, parse_dates=True)
+
+    assert sorted(model_df.columns) == sorted(expected.get_model_df().columns)
+    assert model_df.to_numpy() == pytest.approx(expected.get_model_df()[model_df.columns].to_numpy(dtype=float),
+                                                nan_ok=True, abs=1e-4, rel=1e-4)
+    assert sorted(service.get_tags('HIST')) == sorted(expected.get_model_df().columns)
+
+
+def test_concurrent_builds_claim_unique_files(tmp_path, service):
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        model_files = list(executor.map(lambda x: service.build('2021-01-01', '10:00:00', 'HIST', time_span=1.0),
+                                        range(8)))
+
+    assert len(set(model_files)) == 8
+    assert len(os.listdir(tmp_path / 'queries')) == 8
+    assert all(os.path.getsize(model_file) > 0 for model_file in model_files)
+
+
+def test_overlapping_window_is_reused(service):
+    service.build('2021-01-01', '10:00:00', 'HIST', time_span=1.0)
+    service.build('2021-01-01', '09:50:00', 'HIST', time_span=0.5)
+
+    assert len(service.windows) == 1
+
+
+def test_missing_table(service):
+    with pytest.raises(ValueError):
+        service.build('2021-01-01', '10:00:00', 'MISSING')
+
+
+def test_changed_window_is_fetched_again(service, engine):
+    service.build('2021-01-01', '10:00:00', 'HIST', time_span=1.0)
+    first_df = next(iter(service.windows.values())).result()
+
+    insert_rows(engine, 'HIST', [{'id': 1000, '_NAME': 'NEW', '_NUMERICID': 100, '_VALUE': '0.5',
+                                  '_TIMESTAMP': sample_time - timedelta(minutes=15), '_QUALITY': 192}])
+    model_file = service.build('2021-01-01', '09:50:00', 'HIST', time_span=0.5)
+
+    # stale window was dropped, new window holds the added row
+    assert len(service.windows) == 1
+    assert next(iter(service.windows.values())).result() is not first_df
+    assert 'NEW' in pd.read_csv(model_file, index_col=0).columns
@@ -0,0 +1,41 @@
+import importlib
+import importlib.util
+import os
+
+import pandas as pd
+import pytest
+
+from .conftest import insert_rows, make_rows
+
+pytest.importorskip('pyarrow')
+
+
+@pytest.mark.parametrize('backend', ['pandas', pytest.param('duckdb', marks=pytest.mark.skipif(
+    importlib.util.find_spec('duckdb') is None, reason='duckdb not installed'))])
+def test_spilled_build_matches_in_memory(engine, build_model, monkeypatch, tmp_path, backend):
+    # _QUALITY is NULL for one tag, so chunks of 50 rows infer different dtypes for it
+    rows = make_rows(600, seed=3)
+    for row in rows:
+        if row['_NAME'] == 'FLOAT':
+            row['_QUALITY'] = None
+    insert_rows(engine, 'NULLS', rows)
+
+    model_module = importlib.import_module('build_csv_model.ModelClass')
+    monkeypatch.setattr(model_module, 'default_chunk_size', 50)
+
+    in_memory = build_model(table='NULLS', backend=backend)
+    assert in_memory.spill_store is None
+
+    spill_dir = tmp_path / 'spill'
+    spill_dir.mkdir()
+    monkeypatch.setattr(model_module, 'spill_memory_budget', 1)
+    monkeypatch.setattr(model_module, 'spill_dir', str(spill_dir))
+
+    spilled = build_model(table='NULLS', backend=backend)
+    assert spilled.spill_store is not None and os.listdir(spill_dir)
+
+    pd.testing.assert_frame_equal(spilled.get_model_df(), in_memory.get_model_df(), check_like=True)
+    assert spilled.get_flag_columns() == in_memory.get_flag_columns()
+
+    spilled.cleanup_spill()
+    assert os.listdir(spill_dir) == []
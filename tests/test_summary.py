@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from build_csv_model.summary import refresh_summary, read_high_water_mark, summarize_rows, is_summary_table
+
+from .conftest import sample_time, insert_rows, make_rows
+
+
+def test_summary_matches_raw_model(engine, build_model):
+    raw_model = build_model()
+
+    refresh_summary(engine, 'HIST', batch_size=37)
+    summary_model = build_model(use_summary=True)
+
+    # every timestep ends before the high-water mark, so no raw rows are queried
+    assert summary_model.summary_df is not None
+    assert len(summary_model.get_guery_df()) == 0
+
+    # tags are ordered as first seen, which differs between summary and raw rows
+    pd.testing.assert_frame_equal(summary_model.get_model_df(), raw_model.get_model_df(), check_like=True)
+    assert summary_model.get_flag_columns() == raw_model.get_flag_columns()
+
+
+def test_summary_and_raw_rows_match_raw_model(engine, build_model):
+    rows = make_rows(600, seed=2)
+    split = sample_time - timedelta(minutes=25)
+
+    # summary covers timesteps up to 09:30, rows after it are queried raw
+    insert_rows(engine, 'SPLIT', [row for row in rows if row['_TIMESTAMP'] <= split])
+    refresh_summary(engine, 'SPLIT')
+    insert_rows(engine, 'SPLIT', [row for row in rows if row['_TIMESTAMP'] > split])
+
+    summary_model = build_model(table='SPLIT', use_summary=True)
+    raw_model = build_model(table='SPLIT')
+
+    assert summary_model.query_start == sample_time - timedelta(minutes=30)
+    pd.testing.assert_frame_equal(summary_model.get_model_df(), raw_model.get_model_df(), check_like=True)
+    assert summary_model.get_flag_columns() == raw_model.get_flag_columns()
+
+
+def test_incremental_refresh_matches_single_pass(engine):
+    refresh_summary(engine, 'HIST', batch_size=50)
+    insert_rows(engine, 'HIST', make_rows(300, seed=1, first_id=601))
+    assert refresh_summary(engine, 'HIST', batch_size=50) == 300
+
+    hwm_id, _hwm_ts = read_high_water_mark(engine, 'HIST')
+    assert hwm_id == 900
+
+    keys = ['bucket', '_NAME']
+    columns = keys + ['value_count', 'any_true', 'tail_sum', 'tail_count']
+    incremental = pd.read_sql_table('HIST_SUMMARY10', engine)[columns].sort_values(keys, ignore_index=True)
+    single_pass = summarize_rows(pd.read_sql_table('HIST', engine).sort_values('id'))[columns].sort_values(
+        keys, ignore_index=True)
+
+    pd.testing.assert_frame_equal(incremental, single_pass, check_dtype=False)
+
+
+def test_zero_restarts_sum():
+    df = pd.DataFrame({
+        '_NAME': ['A', 'A', 'A', 'A', 'B', 'B'],
+        '_VALUE': ['2.5', '0', '0.5', '2.5', '0.5', '0'],
+        '_TIMESTAMP': pd.to_datetime(['2021-01-01 09:55:00'] * 6),
+    })
+
+    rows = summarize_rows(df).set_index('_NAME')
+
+    assert rows.loc['A', 'tail_sum'] == 3.0 and rows.loc['A', 'tail_count'] == 2
+    assert rows.loc['A', 'value_count'] == 4
+    assert rows.loc['B', 'tail_count'] == 0 and rows.loc['B', 'has_zero'] == 1
+
+
+def test_is_summary_table():
+    assert is_summary_table('HIST_SUMMARY10')
+    assert is_summary_table('HIST_SUMMARY10_HWM')
+    assert not is_summary_table('HIST')
+
+
+def test_late_rows_are_queried_raw(engine, build_model):
+    refresh_summary(engine, 'HIST')
+
+    # rows above the high-water mark with timestamps inside summarized timesteps
+    late = sample_time - timedelta(minutes=35)
+    insert_rows(engine, 'HIST', [
+        {'id': 1000 + x, '_NAME': 'LATE', '_NUMERICID': 100, '_VALUE': str(x + 0.5),
+         '_TIMESTAMP': late + timedelta(seconds=x), '_QUALITY': 192} for x in range(5)])
+
+    summary_model = build_model(use_summary=True)
+    raw_model = build_model()
+
+    assert summary_model.query_start == sample_time - timedelta(minutes=40)
+    assert 'LATE' in summary_model.get_model_df().columns
+    pd.testing.assert_frame_equal(summary_model.get_model_df(), raw_model.get_model_df(), check_like=True)
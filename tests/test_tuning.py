@@ -0,0 +1,74 @@
+import json
+import os
+
+from build_csv_model.tuning import ChunkTuner
+
+
+def make_tuner(**kwargs):
+    options = dict(initial=1000, minimum=100, maximum=100000, max_latency=10.0, max_chunk_bytes=10000)
+    options.update(kwargs)
+
+    return ChunkTuner('HIST', **options)
+
+
+def test_grows_while_throughput_improves():
+    tuner = make_tuner()
+
+    assert tuner.record(1000, 1.0, 100) == 2000
+    assert tuner.record(2000, 1.0, 100) == 4000
+    assert tuner.record(4000, 1.0, 100) == 8000
+
+
+def test_falls_back_to_best_size():
+    tuner = make_tuner()
+    tuner.record(1000, 1.0, 100)
+    tuner.record(2000, 1.0, 100)
+
+    # 4000 rows are not fetched faster than 2000 rows, go back and stay there
+    assert tuner.record(4000, 2.0, 100) == 2000
+    assert tuner.record(2000, 1.0, 100) == 2000
+    assert tuner.best_size == 2000
+
+
+def test_shrinks_on_latency_limit():
+    tuner = make_tuner()
+
+    assert tuner.record(1000, 11.0, 100) == 500
+    # stops growing once a limit was hit
+    assert tuner.record(500, 0.5, 100) == 500
+
+
+def test_shrinks_on_memory_limit():
+    tuner = make_tuner(initial=200)
+
+    assert tuner.record(200, 0.1, 20000) == 100
+    # never below minimum
+    assert tuner.record(100, 0.1, 20000) == 100
+
+
+def test_size_is_stored_per_table(tmp_path):
+    state_file = str(tmp_path / 'state' / 'chunk_sizes.json')
+
+    tuner = ChunkTuner('HIST', state_file=state_file, initial=1000, minimum=100)
+    tuner.best_size = 4000
+    tuner.save()
+
+    other = ChunkTuner('OTHER', state_file=state_file, initial=1000, minimum=100)
+    other.best_size = 250000
+    other.save()
+
+    with open(state_file) as f:
+        assert json.load(f) == {'HIST': 4000, 'OTHER': 250000}
+
+    assert ChunkTuner('HIST', state_file=state_file, initial=1000, minimum=100).get_chunk_size() == 4000
+    assert ChunkTuner('NEW', state_file=state_file, initial=1000, minimum=100).get_chunk_size() == 1000
+    assert os.listdir(tmp_path / 'state') == ['chunk_sizes.json']
+
+
+def test_failed_save_does_not_raise(tmp_path):
+    # parent of state file is a file, so it can't be written
+    blocker = tmp_path / 'blocker'
+    blocker.write_text('')
+
+    tuner = ChunkTuner('HIST', state_file=str(blocker / 'chunk_sizes.json'), initial=1000)
+    tuner.save()